@@ -13,12 +13,13 @@ from app.core.security import encrypt_password, decrypt_password
 from app.models.schemas import ConnectionCreate, ConnectionUpdate, ConnectionResponse
 from app.services.query_engine import QueryEngine
 from app.core.engine_pool import get_engine
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Thread pool for blocking operations
-_test_executor = ThreadPoolExecutor(max_workers=4)
+_test_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="conn-test")
 
 class TestConnectionRequest(BaseModel):
     db_type: str
@@ -90,7 +91,7 @@ async def test_new_connection(
         logger.info(f"Testing connection to {request.host}:{request.port}/{request.database}")
 
         # Run in thread pool with timeout from config
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         try:
             result = await asyncio.wait_for(
                 loop.run_in_executor(
@@ -267,7 +268,7 @@ async def test_connection(
         }
 
         # Run in thread pool with timeout from config
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         result = await asyncio.wait_for(
             loop.run_in_executor(
                 _test_executor,
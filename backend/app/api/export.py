@@ -1,15 +1,14 @@
 """Export API - Excel, CSV"""
+import asyncio
 from io import BytesIO
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-import polars as pl
 from app.db.database import get_db, Report, Connection
 from app.core.deps import get_current_user
 from app.core.security import decrypt_password
-from app.services.query_engine import QueryEngine
-from app.core.engine_pool import get_engine
+from app.services.query_engine import QueryEngine, _run_query
 
 router = APIRouter()
 
@@ -44,13 +43,12 @@ async def export_xlsx(
     QueryEngine.ensure_pool_warm(connection.db_type, config)
 
     try:
-        engine = get_engine(connection.db_type, config)
-        with engine.connect() as conn:
-            df = pl.read_database(report.query, connection=conn)
+        # Query and file encoding both run in worker threads, off the event loop
+        df = await _run_query(QueryEngine._execute_df_sync, connection.db_type, config, report.query)
 
         # Write to Excel
         output = BytesIO()
-        df.write_excel(output, worksheet="Data")
+        await asyncio.to_thread(df.write_excel, output, worksheet="Data")
         output.seek(0)
         
         filename = f"{report.name.replace(' ', '_')}.xlsx"
@@ -94,12 +92,11 @@ async def export_csv(
     QueryEngine.ensure_pool_warm(connection.db_type, config)
 
     try:
-        engine = get_engine(connection.db_type, config)
-        with engine.connect() as conn:
-            df = pl.read_database(report.query, connection=conn)
+        # Query and file encoding both run in worker threads, off the event loop
+        df = await _run_query(QueryEngine._execute_df_sync, connection.db_type, config, report.query)
 
         output = BytesIO()
-        df.write_csv(output)
+        await asyncio.to_thread(df.write_csv, output)
         output.seek(0)
         
         filename = f"{report.name.replace(' ', '_')}.csv"
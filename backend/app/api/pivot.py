@@ -2,22 +2,28 @@
 PIVOT API - High Performance Aggregations with Split By and Delta Calculations
 
 This is the KEY endpoint that:
-1. Aggregates data server-side with ROLLUP
+1. Aggregates data server-side with a plain GROUP BY (leaf level only)
 2. Supports "Split By" (column pivoting) using Polars
 3. Automatically calculates Delta columns for period comparisons
 """
 import time
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Response
+import polars as pl
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from app.db.database import get_db, Report, Connection
 from app.core.deps import get_current_user
 from app.core.security import decrypt_password
-from app.services.query_engine import QueryEngine, _build_safe_filter_clause
-from app.core.engine_pool import get_engine
+from app.services.query_engine import (
+    QueryEngine, ALLOWED_AGGREGATIONS, validate_pivot_fields,
+    get_dialect, _build_safe_filter_clause, _inline_row_limit, _run_blocking, _run_query, _to_ipc_bytes, _to_ipc_bytes_async
+)
+from app.core.config import settings
+from app.utils.arrow_response import ArrowResponse
 from app.services.cache import cache
 
 logger = logging.getLogger(__name__)
@@ -40,11 +46,58 @@ class EnhancedPivotRequest(BaseModel):
     sort: Optional[List[dict]] = None
     calculate_delta: bool = True       # Auto-calculate differences
     limit: Optional[int] = None        # Limit aggregated rows for preview mode
+    rollup: bool = False               # Include subtotal rows (GROUP BY ROLLUP) in one query
+
+
+class LazyPivotBody(BaseModel):
+    """Body of /lazy: the pivot request plus the filters of the expanded parent"""
+    request: EnhancedPivotRequest
+    parent_filters: dict = {}
+
+
+async def _parse_json_body(http_request: Request, model: type[BaseModel]):
+    """
+    Decode a body straight from the raw bytes with pydantic-core's JSON
+    parser, skipping the intermediate dict FastAPI builds via json.loads.
+    Invalid bodies still get the standard 422 response.
+    """
+    try:
+        return model.model_validate_json(await http_request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+async def pivot_request_body(http_request: Request) -> EnhancedPivotRequest:
+    return await _parse_json_body(http_request, EnhancedPivotRequest)
+
+
+async def lazy_pivot_body(http_request: Request) -> LazyPivotBody:
+    return await _parse_json_body(http_request, LazyPivotBody)
+
+
+def _validate_request_fields(report: Report, request: "EnhancedPivotRequest", extra_filters: Optional[dict] = None):
+    """
+    Reject group_by/split_by/metric/filter fields that are not columns of the
+    report, and metric aggregations the SQL builders do not accept
+    """
+    fields = list(request.group_by or []) + list(request.split_by or [])
+    for m in request.metrics or []:
+        fields.extend([m.field, m.revenueField, m.costField])
+        if m.type != 'margin' and m.field and m.aggregation.upper() not in ALLOWED_AGGREGATIONS:
+            raise HTTPException(status_code=400, detail=f"Unsupported aggregation: {m.aggregation}")
+    fields.extend(request.filters.keys())
+    if extra_filters:
+        fields.extend(extra_filters.keys())
+    try:
+        validate_pivot_fields(report.columns_config, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.post("/{report_id}")
 async def execute_pivot(
     report_id: int,
-    request: EnhancedPivotRequest,
+    request: EnhancedPivotRequest = Depends(pivot_request_body),
     force_refresh: bool = False,
     db: AsyncSession = Depends(get_db),
     user = Depends(get_current_user)
@@ -64,9 +117,6 @@ async def execute_pivot(
 
     Result columns: Cliente | Electronics|2023 | Electronics|2024 | Furniture|2023 | ...
     """
-    import polars as pl
-    import pyarrow.ipc as ipc
-    from io import BytesIO
     
     start_time = time.perf_counter()
     
@@ -81,28 +131,32 @@ async def execute_pivot(
         raise HTTPException(status_code=404, detail="Report not found")
     
     report, connection = row
+    _validate_request_fields(report, request)
     
-    # Build config hash for caching
+    # Build config hash for caching (everything that changes the result)
     config = {
+        "connection_id": report.connection_id,
         "query": report.query,
         "group_by": request.group_by,
         "split_by": request.split_by,
         "metrics": [m.model_dump() for m in request.metrics],
         "filters": request.filters,
-        "calculate_delta": request.calculate_delta
+        "calculate_delta": request.calculate_delta,
+        "limit": request.limit,
+        "rollup": request.rollup
     }
     config_hash = QueryEngine.hash_config(config)
     
     # Check cache
     cache_hit = False
     if report.cache_enabled and not force_refresh:
-        cached = await cache.get_pivot(report_id, config_hash)
+        cached, cached_rows = await cache.get_pivot(report_id, config_hash)
         if cached:
             cache_hit = True
             arrow_bytes = cached
-            row_count = -1
+            row_count = cached_rows
             elapsed = (time.perf_counter() - start_time) * 1000
-            logger.info(f"Pivot cache HIT for report {report_id} in {elapsed:.1f}ms")
+            logger.info("Pivot cache HIT for report %s in %.1fms", report_id, elapsed)
     
     if not cache_hit:
         # Build config and ensure pool is warm
@@ -140,27 +194,34 @@ async def execute_pivot(
                 request.limit  # Pass limit for preview mode
             )
         else:
-            # Standard pivot without split
-            arrow_bytes, row_count, query_time = await QueryEngine.execute_pivot(
-                connection.db_type,
-                config,
-                report.query,
-                group_by,
-                metrics,
-                request.filters,
-                request.limit  # Pass limit for preview mode
+            # Standard pivot without split: aggregate the cached raw data
+            # in-process when available, otherwise push it to the DB
+            local = None if request.rollup else await pivot_from_cached_data(
+                report_id, report, connection.db_type, group_by, metrics, request.filters, request.limit
             )
+            if local:
+                arrow_bytes, row_count, query_time = local
+            else:
+                arrow_bytes, row_count, query_time = await QueryEngine.execute_pivot(
+                    connection.db_type,
+                    config,
+                    report.query,
+                    group_by,
+                    metrics,
+                    request.filters,
+                    request.limit,  # Pass limit for preview mode
+                    request.rollup
+                )
         
         elapsed = (time.perf_counter() - start_time) * 1000
-        logger.info(f"Pivot executed for report {report_id}: {row_count} rows in {elapsed:.1f}ms")
+        logger.info("Pivot executed for report %s: %s rows in %.1fms", report_id, row_count, elapsed)
         
         # Cache result
         if report.cache_enabled:
-            await cache.set_pivot(report_id, config_hash, arrow_bytes)
-    
-    return Response(
+            await cache.set_pivot(report_id, config_hash, arrow_bytes, row_count, report.cache_ttl)
+
+    return ArrowResponse(
         content=arrow_bytes,
-        media_type="application/vnd.apache.arrow.stream",
         headers={
             "X-Query-Time": f"{elapsed:.1f}",
             "X-Cache-Hit": str(cache_hit).lower(),
@@ -169,6 +230,38 @@ async def execute_pivot(
     )
 
 
+async def pivot_from_cached_data(
+    report_id: int,
+    report: Report,
+    db_type: str,
+    group_by: List[str],
+    metrics: List[dict],
+    filters: dict,
+    limit: Optional[int] = None
+) -> Optional[tuple[bytes, int, float]]:
+    """
+    Aggregate with Polars from the raw report data cached by GET /reports/{id}/data.
+    Returns None (caller falls back to SQL) when the cache is cold, the data is
+    larger than LOCAL_PIVOT_MAX_BYTES, or the pivot can't be reproduced locally.
+    """
+    if not report.cache_enabled or not (group_by or metrics):
+        return None
+
+    # Same key as GET /reports/{id}/data
+    raw = await cache.get_query(report_id, QueryEngine.hash_config({"query": report.query}))
+    if not raw or len(raw) > settings.LOCAL_PIVOT_MAX_BYTES:
+        return None
+
+    try:
+        return await _run_blocking(
+            QueryEngine._aggregate_cached_sync,
+            db_type, raw, group_by, metrics, filters, limit
+        )
+    except Exception as e:
+        logger.warning("In-process pivot failed for report %s, using SQL: %s", report_id, e)
+        return None
+
+
 async def execute_pivot_with_split(
     db_type: str,
     config: dict,
@@ -194,21 +287,15 @@ async def execute_pivot_with_split(
     - split_by: ["Category", "Anno"]
     - Creates columns: Electronics|2023, Electronics|2024, Furniture|2023, etc.
     """
-    import polars as pl
-    import pyarrow.ipc as ipc
-    from io import BytesIO
-    import asyncio
-
-    # DEBUG: Log split pivot parameters
-    logger.info(f"🔍 execute_pivot_with_split called:")
-    logger.info(f"   - group_by: {group_by}")
-    logger.info(f"   - split_by: {split_by}")
-    logger.info(f"   - metrics count: {len(metrics)}")
-    if metrics:
-        for i, m in enumerate(metrics[:3]):
-            logger.info(f"   - metric[{i}]: field={m.get('field')}, agg={m.get('aggregation')}, name={m.get('name')}")
-
-    is_mssql = db_type == "mssql"
+
+    # DEBUG: Log split pivot parameters (formatted only when DEBUG is enabled)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "🔍 execute_pivot_with_split called: group_by=%s split_by=%s metrics=%d head=%s",
+            group_by, split_by, len(metrics), metrics[:3]
+        )
+
+    dialect = get_dialect(db_type)
 
     # GROUP BY mode: Build aggregated SELECT
     select_parts = []
@@ -216,10 +303,7 @@ async def execute_pivot_with_split(
     # Group by columns (split_by is already a list, don't wrap it again!)
     all_groups = group_by + split_by
     for col in all_groups:
-        if is_mssql:
-            select_parts.append(f'[{col}]')
-        else:
-            select_parts.append(f'"{col}"')
+        select_parts.append(dialect.quote(col))
 
     # Metrics - include ALL aggregations (SUM, AVG, COUNT, MIN, MAX)
     metric_names = []
@@ -228,34 +312,33 @@ async def execute_pivot_with_split(
         field = m.get('field', '')
         name = m.get('name', field)
 
-        if field and agg in ['SUM', 'AVG', 'COUNT', 'MIN', 'MAX']:
+        if field:
+            if agg not in ALLOWED_AGGREGATIONS:
+                raise ValueError(f"Unsupported aggregation: {agg}")
             metric_names.append(name)
             # FIX: Handle COUNT(*) correctly without quoting *
             if field == '*':
-                select_parts.append(f'{agg}(*) AS [{name}]' if is_mssql else f'{agg}(*) AS "{name}"')
-            elif is_mssql:
-                select_parts.append(f'{agg}([{field}]) AS [{name}]')
+                select_parts.append(f'{agg}(*) AS {dialect.quote(name)}')
             else:
-                select_parts.append(f'{agg}("{field}") AS "{name}"')
+                select_parts.append(f'{agg}({dialect.quote(field)}) AS {dialect.quote(name)}')
 
     # Log what we're using
-    logger.info(f"📊 Metrics for pivot: {metric_names}")
+    logger.debug("📊 Metrics for pivot: %s", metric_names)
 
     # Build GROUP BY
-    if is_mssql:
-        group_clause = ', '.join(f'[{col}]' for col in all_groups)
-    else:
-        group_clause = ', '.join(f'"{col}"' for col in all_groups)
+    group_clause = ', '.join(dialect.quote(col) for col in all_groups)
 
     # Build WHERE clause using parameterized queries (SQL injection safe)
-    where_sql, filter_params = _build_safe_filter_clause(filters, is_mssql)
+    where_sql, filter_params = _build_safe_filter_clause(filters, dialect)
 
-    # Final SQL with safe limit handling
+    # Final SQL with safe limit handling (bound, so the SQL text is shape-stable)
     safe_limit = int(limit) if limit else None
-    if safe_limit and is_mssql:
-        sql = f"SELECT TOP {safe_limit} {', '.join(select_parts)} FROM ({base_query}) AS base_data {where_sql} GROUP BY {group_clause}"
+    if safe_limit:
+        filter_params = {**filter_params, "row_limit": safe_limit}
+    if safe_limit and dialect.is_mssql:
+        sql = f"SELECT TOP (:row_limit) {', '.join(select_parts)} FROM ({base_query}) AS base_data {where_sql} GROUP BY {group_clause}"
     elif safe_limit:
-        sql = f"SELECT {', '.join(select_parts)} FROM ({base_query}) AS base_data {where_sql} GROUP BY {group_clause} LIMIT {safe_limit}"
+        sql = f"SELECT {', '.join(select_parts)} FROM ({base_query}) AS base_data {where_sql} GROUP BY {group_clause} LIMIT :row_limit"
     else:
         sql = f"""
             SELECT {', '.join(select_parts)}
@@ -264,24 +347,17 @@ async def execute_pivot_with_split(
             GROUP BY {group_clause}
         """
 
-    logger.info(f"Split pivot SQL: {sql[:300]}...")
+    logger.debug("Split pivot SQL: %.300s...", sql)
 
     # Execute query with parameters (SQL injection safe)
-    loop = asyncio.get_event_loop()
-    df = await loop.run_in_executor(
-        None,
+    df = await _run_query(
         QueryEngine._execute_df_with_params_sync,
         db_type, config, sql, filter_params
     )
     
-    arrow_table = df.to_arrow()
-
     if df.is_empty():
         # Return empty result
-        sink = BytesIO()
-        with ipc.new_stream(sink, arrow_table.schema) as writer:
-            writer.write_table(arrow_table)
-        return sink.getvalue(), 0
+        return _to_ipc_bytes(df.to_arrow()), 0
 
     # Pivot with multi-level column hierarchy if split_by is present
     if split_by:
@@ -300,11 +376,11 @@ async def execute_pivot_with_split(
                 pivot_column = split_by[0]
 
             pivot_index = group_by
-            logger.info(f"📊 Pivoting with aggregation, index={pivot_index}, column={pivot_column}")
+            logger.debug("📊 Pivoting with aggregation, index=%s, column=%s", pivot_index, pivot_column)
 
             result_df = None
             for metric_name in metric_names:
-                logger.info(f"   Pivoting '{metric_name}' with aggregation 'sum'")
+                logger.debug("   Pivoting '%s' with aggregation 'sum'", metric_name)
 
                 pivoted = df.pivot(
                     values=metric_name,
@@ -376,13 +452,7 @@ async def execute_pivot_with_split(
         result_df = result_df.drop("__row_index__")
 
     # Convert to Arrow and serialize
-    arrow_result = result_df.to_arrow()
-    
-    sink = BytesIO()
-    with ipc.new_stream(sink, arrow_result.schema) as writer:
-        writer.write_table(arrow_result)
-    
-    return sink.getvalue(), result_df.height
+    return await _to_ipc_bytes_async(result_df.to_arrow()), result_df.height
 
 
 @router.get("/{report_id}/schema")
@@ -419,15 +489,20 @@ async def get_pivot_schema(
         # Ensure pool is warm before query (eliminates cold start)
         QueryEngine.ensure_pool_warm(connection.db_type, config)
 
-        # Get just 1 row to infer schema
-        if connection.db_type == "mssql":
-            limit_query = f"SELECT TOP 1 * FROM ({report.query}) AS schema_query"
-        else:
-            limit_query = f"SELECT * FROM ({report.query}) AS schema_query LIMIT 1"
+        # Get just 1 row to infer schema (cap inlined on simple queries, bound)
+        dialect = get_dialect(connection.db_type)
+        limit_query = _inline_row_limit(report.query, dialect)
+        if not limit_query:
+            if dialect.is_mssql:
+                limit_query = f"SELECT TOP (:row_limit) * FROM ({report.query}) AS schema_query"
+            else:
+                limit_query = f"SELECT * FROM ({report.query}) AS schema_query LIMIT :row_limit"
         
         logger.info(f"Executing schema query for report {report_id}")
         
-        arrow_table = QueryEngine._execute_query_sync(connection.db_type, config, limit_query)
+        arrow_table = await _run_query(
+            QueryEngine._execute_arrow_with_params_sync, connection.db_type, config, limit_query, {"row_limit": 1}
+        )
         
         columns = []
         for field in arrow_table.schema:
@@ -546,9 +621,8 @@ async def load_pivot_config(
 @router.post("/{report_id}/lazy")
 async def execute_lazy_pivot(
     report_id: int,
-    request: EnhancedPivotRequest,
+    body: LazyPivotBody = Depends(lazy_pivot_body),
     depth: int = 0,
-    parent_filters: dict = {},
     db: AsyncSession = Depends(get_db),
     user = Depends(get_current_user)
 ):
@@ -563,10 +637,9 @@ async def execute_lazy_pivot(
     1. Initial: depth=0 → 50 categories
     2. Expand "Electronics": depth=1, parent_filters={"Category": "Electronics"} → subcategories
     """
-    import pyarrow.ipc as ipc
-    from io import BytesIO
     
     start_time = time.perf_counter()
+    request, parent_filters = body.request, body.parent_filters
     
     # Get report and connection
     result = await db.execute(
@@ -579,11 +652,39 @@ async def execute_lazy_pivot(
         raise HTTPException(status_code=404, detail="Report not found")
     
     report, connection = row
+    _validate_request_fields(report, request, parent_filters)
     
     # Validate depth
     if depth >= len(request.group_by):
         raise HTTPException(status_code=400, detail=f"Invalid depth {depth}")
 
+    # Group by ONLY current level
+    current_dimension = request.group_by[depth]
+    combined_filters = {**request.filters, **parent_filters}
+    metrics = [m.model_dump() for m in request.metrics]
+
+    config_hash = QueryEngine.hash_config({
+        "mode": "lazy",
+        "connection_id": report.connection_id,
+        "query": report.query,
+        "group_by": [current_dimension],
+        "metrics": metrics,
+        "filters": combined_filters
+    })
+    if report.cache_enabled:
+        cached, cached_rows = await cache.get_pivot(report_id, config_hash)
+        if cached:
+            elapsed = (time.perf_counter() - start_time) * 1000
+            return ArrowResponse(
+                content=cached,
+                headers={
+                    "X-Row-Count": str(cached_rows) if cached_rows >= 0 else "cached",
+                    "X-Query-Time": f"{elapsed:.1f}",
+                    "X-Cache-Hit": "true",
+                    "X-Depth": str(depth)
+                }
+            )
+
     # Build config and ensure pool is warm
     config = {
         "host": connection.host,
@@ -597,30 +698,35 @@ async def execute_lazy_pivot(
     # Ensure pool is warm before query (eliminates cold start)
     QueryEngine.ensure_pool_warm(connection.db_type, config)
 
-    # Group by ONLY current level
-    current_dimension = request.group_by[depth]
-    combined_filters = {**request.filters, **parent_filters}
-    
     # Execute query for this level only
-    arrow_bytes, row_count, query_time = await QueryEngine.execute_pivot(
-        connection.db_type,
-        config,
-        report.query,
-        [current_dimension],
-        [m.model_dump() for m in request.metrics],
-        combined_filters,
-        None
+    local = await pivot_from_cached_data(
+        report_id, report, connection.db_type, [current_dimension], metrics, combined_filters
     )
+    if local:
+        arrow_bytes, row_count, query_time = local
+    else:
+        arrow_bytes, row_count, query_time = await QueryEngine.execute_pivot(
+            connection.db_type,
+            config,
+            report.query,
+            [current_dimension],
+            metrics,
+            combined_filters,
+            None
+        )
     
     elapsed = (time.perf_counter() - start_time) * 1000
-    logger.info(f"Lazy level {depth} for report {report_id}: {row_count} rows in {elapsed:.1f}ms")
+    logger.info("Lazy level %d for report %s: %d rows in %.1fms", depth, report_id, row_count, elapsed)
+
+    if report.cache_enabled:
+        await cache.set_pivot(report_id, config_hash, arrow_bytes, row_count, report.cache_ttl)
     
-    return Response(
+    return ArrowResponse(
         content=arrow_bytes,
-        media_type="application/vnd.apache.arrow.stream",
         headers={
             "X-Row-Count": str(row_count),
             "X-Query-Time": f"{elapsed:.1f}",
+            "X-Cache-Hit": "false",
             "X-Depth": str(depth)
         }
     )
@@ -629,7 +735,7 @@ async def execute_lazy_pivot(
 @router.post("/{report_id}/grand-total")
 async def get_grand_total(
     report_id: int,
-    request: EnhancedPivotRequest,
+    request: EnhancedPivotRequest = Depends(pivot_request_body),
     db: AsyncSession = Depends(get_db),
     user = Depends(get_current_user)
 ):
@@ -637,8 +743,6 @@ async def get_grand_total(
     Get grand total (no grouping, aggregate everything).
     Used for total row in lazy loading.
     """
-    import pyarrow.ipc as ipc
-    from io import BytesIO
     
     start_time = time.perf_counter()
     
@@ -653,6 +757,28 @@ async def get_grand_total(
         raise HTTPException(status_code=404, detail="Report not found")
     
     report, connection = row
+    _validate_request_fields(report, request)
+    metrics = [m.model_dump() for m in request.metrics]
+
+    config_hash = QueryEngine.hash_config({
+        "mode": "grand_total",
+        "connection_id": report.connection_id,
+        "query": report.query,
+        "metrics": metrics,
+        "filters": request.filters
+    })
+    if report.cache_enabled:
+        cached, cached_rows = await cache.get_pivot(report_id, config_hash)
+        if cached:
+            elapsed = (time.perf_counter() - start_time) * 1000
+            return ArrowResponse(
+                content=cached,
+                headers={
+                    "X-Row-Count": str(cached_rows) if cached_rows >= 0 else "cached",
+                    "X-Query-Time": f"{elapsed:.1f}",
+                    "X-Cache-Hit": "true"
+                }
+            )
 
     # Build config and ensure pool is warm
     config = {
@@ -668,23 +794,30 @@ async def get_grand_total(
     QueryEngine.ensure_pool_warm(connection.db_type, config)
 
     # Execute with NO grouping
-    arrow_bytes, row_count, query_time = await QueryEngine.execute_pivot(
-        connection.db_type,
-        config,
-        report.query,
-        [],  # No group by = grand total
-        [m.model_dump() for m in request.metrics],
-        request.filters,
-        None
-    )
+    local = await pivot_from_cached_data(report_id, report, connection.db_type, [], metrics, request.filters)
+    if local:
+        arrow_bytes, row_count, query_time = local
+    else:
+        arrow_bytes, row_count, query_time = await QueryEngine.execute_pivot(
+            connection.db_type,
+            config,
+            report.query,
+            [],  # No group by = grand total
+            metrics,
+            request.filters,
+            None
+        )
     
     elapsed = (time.perf_counter() - start_time) * 1000
+
+    if report.cache_enabled:
+        await cache.set_pivot(report_id, config_hash, arrow_bytes, row_count, report.cache_ttl)
     
-    return Response(
+    return ArrowResponse(
         content=arrow_bytes,
-        media_type="application/vnd.apache.arrow.stream",
         headers={
             "X-Row-Count": str(row_count),
-            "X-Query-Time": f"{elapsed:.1f}"
+            "X-Query-Time": f"{elapsed:.1f}",
+            "X-Cache-Hit": "false"
         }
     )
@@ -1,22 +1,34 @@
 """Reports API with high-performance data streaming"""
 import time
+import asyncio
 import logging
+import pyarrow.ipc as ipc
+from typing import AsyncIterator, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from app.db.database import get_db, Report, Connection
 from app.core.deps import get_current_user, get_current_admin, get_current_superuser
 from app.core.security import decrypt_password
 from app.models.schemas import ReportCreate, ReportUpdate, ReportResponse, GridRequest, PivotDrillRequest
-from app.services.query_engine import QueryEngine, query_engine
+from app.services.query_engine import QueryEngine, query_engine, get_dialect, _inline_row_limit, _run_query, _run_blocking
 from app.services.cache import cache
+from app.core.config import settings
+from app.utils.arrow_response import ArrowResponse
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+_report_list_adapter = TypeAdapter(List[ReportResponse])
+
+# Drill requests being executed, by (report_id, request hash): identical
+# requests fired during a scroll burst share one execution
+_inflight_drills: Dict[tuple, asyncio.Future] = {}
+
 class TestQueryRequest(BaseModel):
     connection_id: int
     query: str
@@ -47,15 +59,20 @@ async def test_query(
         # Ensure pool is warm before query (eliminates cold start)
         QueryEngine.ensure_pool_warm(connection.db_type, config)
 
-        # Wrap query with limit for testing
-        if connection.db_type == "mssql":
-            test_query = f"SELECT TOP 100 * FROM ({request.query}) AS test_query"
-        else:
-            test_query = f"SELECT * FROM ({request.query}) AS test_query LIMIT 100"
+        # Limit for testing: injected into simple queries, wrapped otherwise
+        dialect = get_dialect(connection.db_type)
+        test_query = _inline_row_limit(request.query, dialect)
+        if not test_query:
+            if dialect.is_mssql:
+                test_query = f"SELECT TOP (:row_limit) * FROM ({request.query}) AS test_query"
+            else:
+                test_query = f"SELECT * FROM ({request.query}) AS test_query LIMIT :row_limit"
 
-        # Execute using pool
-        # Nota: usiamo _execute_query_sync direttamente o tramite wrapper
-        arrow_table = QueryEngine._execute_query_sync(connection.db_type, config, test_query)
+        # Execute using pool, off the event loop
+        arrow_table = await _run_query(
+            QueryEngine._execute_arrow_with_params_sync,
+            connection.db_type, config, test_query, {"row_limit": 100}
+        )
         
         return {
             "success": True,
@@ -74,7 +91,14 @@ async def list_reports(
 ):
     """List all reports (SUPERUSER e ADMIN)"""
     result = await db.execute(select(Report).order_by(Report.name))
-    return result.scalars().all()
+    # Serialize the whole list in one pydantic-core pass, skipping
+    # FastAPI's per-item re-validation of the response model
+    return Response(
+        content=_report_list_adapter.dump_json(
+            _report_list_adapter.validate_python(result.scalars().all(), from_attributes=True)
+        ),
+        media_type="application/json"
+    )
 
 @router.post("", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
 async def create_report(
@@ -269,22 +293,35 @@ async def get_report_data(
         # Ensure pool is warm before query (eliminates cold start)
         QueryEngine.ensure_pool_warm(connection.db_type, config)
 
-        # Execute query
-        arrow_bytes, row_count, query_time = await QueryEngine.execute_query(
+        # Execute query, then stream the IPC batches as they are serialized
+        chunks, row_count, query_time = await QueryEngine.execute_query_stream(
             connection.db_type,
             config,
-            report.query
+            report.query,
+            limit=settings.MAX_ROWS_EXPORT
         )
         
         elapsed = (time.perf_counter() - start_time) * 1000
         
-        # Cache result
+        # Cache result once the full stream has been sent
         if report.cache_enabled:
-            await cache.set_query(report_id, query_hash, arrow_bytes)
+            chunks = _stream_and_cache(chunks, report_id, query_hash, settings.MAX_ROWS_EXPORT)
+
+        return StreamingResponse(
+            chunks,
+            media_type="application/vnd.apache.arrow.stream",
+            headers={
+                "X-Query-Time": f"{elapsed:.1f}",
+                "X-Cache-Hit": "false",
+                "X-Row-Count": str(row_count) if row_count >= 0 else "streaming",
+                # Rows are capped here: a stream of exactly this many rows is truncated
+                "X-Row-Limit": str(settings.MAX_ROWS_EXPORT),
+                "Content-Disposition": f"attachment; filename=report_{report_id}.arrow"
+            }
+        )
     
-    return Response(
+    return ArrowResponse(
         content=arrow_bytes,
-        media_type="application/vnd.apache.arrow.stream",
         headers={
             "X-Query-Time": f"{elapsed:.1f}",
             "X-Cache-Hit": str(cache_hit).lower(),
@@ -293,6 +330,23 @@ async def get_report_data(
         }
     )
 
+async def _stream_and_cache(chunks: AsyncIterator[bytes], report_id: int, query_hash: str, row_limit: int):
+    """
+    Yield IPC chunks to the client, then cache the complete stream.
+    A stream that reached row_limit may have been cut by the cap: it is not
+    cached, so the in-process pivot/drill never aggregates a partial result.
+    """
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    data = b"".join(parts)
+    rows = sum(batch.num_rows for batch in ipc.open_stream(data))
+    if rows >= row_limit:
+        logger.warning("Report %s data hit the %d row cap, not cached", report_id, row_limit)
+        return
+    await cache.set_query(report_id, query_hash, data)
+
 @router.post("/{report_id}/refresh-cache")
 async def refresh_cache(
     report_id: int,
@@ -368,22 +422,49 @@ async def execute_grid_query(
         # Ensure pool is warm before query (eliminates cold start)
         QueryEngine.ensure_pool_warm(connection.db_type, config)
 
-        rows, total, elapsed = await query_engine.execute_grid_query(
+        arrow_bytes, total, elapsed = await query_engine.execute_grid_query(
             connection.db_type,
             config,
             report.query,  # Base query
             request
         )
         
-        return {
-            'rows': rows,
-            'lastRow': total,
-            'elapsed_ms': elapsed
-        }
+        return ArrowResponse(
+            content=arrow_bytes,
+            headers={
+                'X-Total-Count': str(total),
+                'X-Query-Time': f"{elapsed:.1f}"
+            }
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def drill_from_cached_data(
+    report_id: int,
+    report: Report,
+    db_type: str,
+    request: PivotDrillRequest
+) -> Optional[tuple[bytes, int, float]]:
+    """
+    Drill-down level aggregated with Polars from the raw report data cached by
+    GET /reports/{id}/data. Returns None (caller falls back to SQL) when the
+    cache is cold, the data is larger than LOCAL_PIVOT_MAX_BYTES, or the
+    request can't be reproduced locally.
+    """
+    if not report.cache_enabled or not request.rowGroupCols:
+        return None
+
+    raw = await cache.get_query(report_id, QueryEngine.hash_config({"query": report.query}))
+    if not raw or len(raw) > settings.LOCAL_PIVOT_MAX_BYTES:
+        return None
+
+    try:
+        return await _run_blocking(QueryEngine._drill_cached_sync, db_type, raw, request)
+    except Exception as e:
+        logger.warning("In-process drill failed for report %s, using SQL: %s", report_id, e)
+        return None
+
 @router.post('/{report_id}/pivot-drill')
 async def execute_pivot_drill(
     report_id: int,
@@ -391,7 +472,6 @@ async def execute_pivot_drill(
     db: AsyncSession = Depends(get_db),
     user = Depends(get_current_user)
 ):
-    import time
     start_total = time.perf_counter()
     
     # 1. Fetch Report
@@ -420,22 +500,40 @@ async def execute_pivot_drill(
         # Ensure pool is warm before query (eliminates cold start)
         QueryEngine.ensure_pool_warm(connection.db_type, config)
 
-        rows, total, elapsed_query = await query_engine.execute_pivot_drill(
-            connection.db_type,
-            config,
-            report.query,  # Base query
-            request
-        )
+        async def run_drill():
+            # Expand from the cached raw data in-process when available
+            local = await drill_from_cached_data(report_id, report, connection.db_type, request)
+            if local:
+                return local
+            return await query_engine.execute_pivot_drill(
+                connection.db_type,
+                config,
+                report.query,  # Base query
+                request
+            )
+
+        key = (report_id, QueryEngine.hash_config(request.model_dump()))
+        task = _inflight_drills.get(key)
+        if task is None:
+            task = _inflight_drills[key] = asyncio.ensure_future(run_drill())
+            task.add_done_callback(lambda _: _inflight_drills.pop(key, None))
+        # shield: a client that disconnects must not cancel the shared query
+        arrow_bytes, total, elapsed_query = await asyncio.shield(task)
         
         total_time = (time.perf_counter() - start_total) * 1000
         logger.info(f"⚡ PIVOT DRILL Report {report_id}: {total} rows. Query={elapsed_query:.1f}ms, Total={total_time:.1f}ms")
         
-        return {
-            'rows': rows,
-            'count': total,
-            'elapsed_ms': elapsed_query
-        }
+        return ArrowResponse(
+            content=arrow_bytes,
+            headers={
+                'X-Total-Count': str(total),
+                'X-Query-Time': f"{elapsed_query:.1f}"
+            }
+        )
         
+    except ValueError as e:
+        # Request the SQL builders reject (aggregation, HAVING type): client error
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"❌ PIVOT DRILL Error Report {report_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -16,6 +16,9 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379"
     CACHE_TTL: int = 7200  # 2 hours default
     CACHE_TTL_PIVOT: int = 600  # 10 minutes for pivot results
+    CACHE_LOCAL_TTL: int = 30  # In-process copy of hot pivot results (0 = disabled)
+    CACHE_LOCAL_MAX_ITEMS: int = 128
+    CACHE_LOCAL_MAX_BYTES: int = 512 * 1024 * 1024
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173", "http://localhost:8001"]
@@ -25,6 +28,10 @@ class Settings(BaseSettings):
     MAX_ROWS_EXPORT: int = 5000000  # 5M rows max
     QUERY_TIMEOUT: int = 300  # 5 minutes
     CONNECTION_TIMEOUT: int = 180  # 3 minutes for connection test with warm-up
+    QUERY_CONCURRENCY: int = 8  # Max blocking DB queries running in worker threads
+    QUERY_CONCURRENCY_PER_DB: int = 6  # Of which at most this many against the same database
+    LOCAL_PIVOT_MAX_BYTES: int = 256 * 1024 * 1024  # Pivot cached raw data in-process up to this size
+    INLINE_ROW_LIMIT: bool = True  # Put TOP/LIMIT into simple report queries instead of wrapping them
     
     class Config:
         env_file = ".env"
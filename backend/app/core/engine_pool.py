@@ -1,42 +1,69 @@
 import urllib.parse
 import hashlib
+import threading
+from functools import lru_cache
 from typing import Dict, Any
 from sqlalchemy import create_engine, Engine
 from sqlalchemy.pool import QueuePool
+from app.core.config import settings
 
 # Singleton globale per mantenere i pool attivi in memoria
 _engines: Dict[str, Engine] = {}
+# get_engine gira anche nei worker thread (executor delle query): evita di creare
+# due pool per la stessa chiave in caso di richieste concorrenti
+_engines_lock = threading.Lock()
+
+@lru_cache(maxsize=64)
+def _engine_key(db_type: str, username: str, host: str, port: Any, database: str, password: str) -> str:
+    """
+    Chiave univoca per identificare la connessione (senza password in chiaro
+    per sicurezza log). Memoizzata: la stessa connessione viene risolta a ogni
+    richiesta e l'hash della password non cambia.
+    """
+    key_data = f"{db_type}://{username}@{host}:{port}/{database}"
+    # Aggiungi hash della password per unicità senza esporla
+    pwd_hash = hashlib.sha256(password.encode()).hexdigest()[:16]
+    return f"{key_data}#{pwd_hash}"
 
 def get_engine(db_type: str, config: Dict[str, Any]) -> Engine:
     """
     Restituisce un Engine SQLAlchemy con Connection Pooling configurato.
     Se l'engine esiste già per questa configurazione, lo riutilizza.
     """
-    # Chiave univoca per identificare la connessione (senza password in chiaro per sicurezza log)
-    key_data = f"{db_type}://{config['username']}@{config['host']}:{config['port']}/{config['database']}"
-    # Aggiungi hash della password per unicità senza esporla
-    pwd_hash = hashlib.sha256(config['password'].encode()).hexdigest()[:16]
-    key = f"{key_data}#{pwd_hash}"
-    
-    if key in _engines:
-        return _engines[key]
-
-    # Costruzione URL SQLAlchemy
-    url = _build_sqlalchemy_url(db_type, config)
-    
-    # Configurazione ottimizzata per evitare il Cold Start
-    engine = create_engine(
-        url,
-        poolclass=QueuePool,
-        pool_size=5,          # Mantiene 5 connessioni sempre aperte
-        max_overflow=10,      # Accetta picchi fino a 15
-        pool_timeout=30,      # Timeout attesa connessione libera
-        pool_recycle=3600,    # Ricicla connessioni ogni ora per evitare stale connections
-        pool_pre_ping=True,   # Verifica che la connessione sia viva prima di usarla
-        echo=False
+    key = _engine_key(
+        db_type, config['username'], config['host'], config['port'],
+        config['database'], config['password']
     )
-    
-    _engines[key] = engine
+
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            return engine
+
+        # Costruzione URL SQLAlchemy
+        url = _build_sqlalchemy_url(db_type, config)
+
+        # Configurazione ottimizzata per evitare il Cold Start
+        engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            # Una connessione persistente per ogni query concorrente ammessa dal
+            # semaforo: le connessioni di overflow vengono chiuse al rilascio e
+            # ogni nuova apertura ripaga handshake TLS e login
+            pool_size=max(5, settings.QUERY_CONCURRENCY),
+            max_overflow=10,      # Accetta picchi oltre il pool base
+            pool_timeout=30,      # Timeout attesa connessione libera
+            pool_recycle=1500,    # Ricicla prima dei tipici idle timeout NAT/cloud (30 min)
+            pool_pre_ping=True,   # Verifica che la connessione sia viva prima di usarla
+            pool_use_lifo=True,   # Riusa le connessioni più calde, lascia invecchiare le altre
+            echo=False
+        )
+
+        _engines[key] = engine
     return engine
 
 def _build_sqlalchemy_url(db_type: str, config: Dict[str, Any]) -> str:
@@ -37,12 +37,13 @@ def get_encryption_key() -> bytes:
     key = hashlib.sha256(settings.SECRET_KEY.encode()).digest()
     return base64.urlsafe_b64encode(key)
 
+# Single cipher instance: key derivation runs once instead of per call
+_fernet = Fernet(get_encryption_key())
+
 def encrypt_password(password: str) -> str:
     """Encrypt database password"""
-    f = Fernet(get_encryption_key())
-    return f.encrypt(password.encode()).decode()
+    return _fernet.encrypt(password.encode()).decode()
 
 def decrypt_password(encrypted: str) -> str:
     """Decrypt database password"""
-    f = Fernet(get_encryption_key())
-    return f.decrypt(encrypted.encode()).decode()
+    return _fernet.decrypt(encrypted.encode()).decode()
@@ -16,32 +16,38 @@ Benefits:
 import logging
 import asyncio
 import time
-from typing import List, Dict, Any
-from sqlalchemy import select, distinct, text
-from app.db.database import AsyncSessionLocal, Report, Connection
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from sqlalchemy import select, distinct, exists, text
+from app.db.database import AsyncSessionLocal, Report, Connection, UserReportAccess, DashboardWidget
 from app.core.security import decrypt_password
-from app.core.engine_pool import get_engine
+from app.core.engine_pool import get_engine, _engine_key
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
-async def warm_up_connections():
+async def warm_up_connections(done: Optional[asyncio.Event] = None):
     """
     Warm-up all database connections used by reports.
 
     This runs at backend startup and initializes connections to all databases
     that have reports defined. The connections are global (backend-side) and
     shared across all users and client connections.
+
+    Args:
+        done: Optional event set when warm-up finishes (successfully or not),
+              used by the /ready endpoint
     """
     try:
         logger.info("🔥 Starting database connection warm-up...")
         start_time = time.time()
 
         # Get all unique connections used by reports
-        connections_to_warm = await get_report_connections()
+        connections_to_warm = dedupe_connections(await get_report_connections())
 
         if not connections_to_warm:
-            logger.info("⚪ No connections found to warm up (no reports defined yet)")
+            logger.info("⚪ No connections found to warm up (no reachable reports yet)")
             return
 
         logger.info(f"🔥 Found {len(connections_to_warm)} database(s) to warm up:")
@@ -69,18 +75,34 @@ async def warm_up_connections():
     except Exception as e:
         logger.error(f"❌ Warm-up failed: {e}")
         # Don't crash the app - warm-up is optional optimization
+    finally:
+        if done is not None:
+            done.set()
 
 
 async def get_report_connections() -> List[Dict[str, Any]]:
     """
-    Get all unique database connections that have reports defined.
+    Get all unique database connections used by reachable reports.
+
+    A report is reachable when it is public, assigned to at least one user or
+    placed on a dashboard: connections referenced only by orphaned reports are
+    not warmed.
 
     Returns:
         List of connection info dicts: [{"id": 1, "name": "SQL Server Prod", "db_type": "mssql", ...}]
     """
     async with AsyncSessionLocal() as session:
-        # Get distinct connection IDs from reports
-        query = select(distinct(Report.connection_id)).where(Report.connection_id.isnot(None))
+        # Get distinct connection IDs from reachable reports
+        is_reachable = (
+            (Report.visibility == "public") |
+            exists().where(UserReportAccess.report_id == Report.id) |
+            exists().where(DashboardWidget.report_id == Report.id)
+        )
+        query = (
+            select(distinct(Report.connection_id))
+            .where(Report.connection_id.isnot(None))
+            .where(is_reachable)
+        )
         result = await session.execute(query)
         connection_ids = [row[0] for row in result.fetchall()]
 
@@ -108,6 +130,59 @@ async def get_report_connections() -> List[Dict[str, Any]]:
         ]
 
 
+def dedupe_connections(connections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drop connections pointing to the same physical database.
+
+    Two Connection rows with the same engine key (db_type, username, host,
+    port, database and password hash, as in engine_pool) share one pool, so
+    warming both would only repeat the handshake. The first occurrence is kept.
+    """
+    seen: Dict[str, str] = {}
+    unique = []
+    for conn in connections:
+        dsn = _engine_key(
+            conn["db_type"], conn["username"], conn["host"], conn["port"],
+            conn["database"], conn["password"]
+        )
+        if dsn in seen:
+            logger.info(f"   - {conn['name']}: same database as {seen[dsn]}, skipped")
+            continue
+        seen[dsn] = conn["name"]
+        unique.append(conn)
+    return unique
+
+
+def _warm_pool_sync(db_type: str, config: Dict[str, Any]) -> None:
+    """Blocking part of the warm-up, run in a worker thread"""
+    # Use connection pool manager - this creates PERSISTENT connections
+    # Open as many connections as one database can use concurrently
+    # (QUERY_CONCURRENCY_PER_DB), handshaking in parallel: every connection
+    # stays checked out until all are open, so each one is a distinct socket
+    # and the first burst of queries finds them all ready in the pool
+    engine = get_engine(db_type, config)
+    size = settings.QUERY_CONCURRENCY_PER_DB
+
+    def ping():
+        # AUTOCOMMIT: the ping needs no transaction, skip the implicit BEGIN/ROLLBACK
+        conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            conn.execute(text("SELECT 1"))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    with ThreadPoolExecutor(max_workers=size, thread_name_prefix="warmup") as pool:
+        futures = [pool.submit(ping) for _ in range(size)]
+    conns = [f.result() for f in futures if not f.exception()]
+    for conn in conns:
+        conn.close()
+    if not conns:
+        # Every attempt failed: surface the error of the first one
+        futures[0].result()
+
+
 async def warm_up_single_connection(conn_info: Dict[str, Any]) -> bool:
     """
     Warm up a single database connection by pre-initializing the connection pool.
@@ -134,12 +209,9 @@ async def warm_up_single_connection(conn_info: Dict[str, Any]) -> bool:
             "ssl_enabled": conn_info.get("ssl_enabled", False)
         }
 
-        # Use connection pool manager - this creates PERSISTENT connections
-        # Just getting the engine and running a query initializes the pool
-        engine = get_engine(db_type, config)
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        
+        # Run off the event loop so background warm-up never blocks requests
+        await asyncio.to_thread(_warm_pool_sync, db_type, config)
+
         success = True
 
         elapsed = time.time() - start_time
@@ -1,9 +1,8 @@
 """Database models and initialization"""
 import logging
-from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, ForeignKey, Table
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, ForeignKey, Table, event, func, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, relationship
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -15,12 +14,34 @@ engine = create_async_engine(
     future=True
 )
 
-# Session factory
-AsyncSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+# SQLite tuning, applied to every new connection: WAL lets readers run
+# alongside a writer, synchronous=NORMAL is safe under WAL and skips an
+# fsync per commit, mmap/cache keep the (small) app DB in memory
+_SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-65536",
 )
 
-Base = declarative_base()
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+# Session factory
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+class Base(DeclarativeBase):
+    pass
+
+# Timestamps are filled by the database (CURRENT_TIMESTAMP), not by a Python
+# callback on every flush. default= renders the same SQL expression inline in
+# the INSERT so tables created before server_default existed are covered too.
 
 # ============================================
 # USER & PERMISSIONS
@@ -44,7 +65,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_system_account = Column(Boolean, default=False)  # True solo per infostudio
     preferences = Column(JSON, default={})
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
     last_login = Column(DateTime)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)  # Chi ha creato questo utente
 
@@ -56,7 +77,7 @@ class UserReportAccess(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False)
     can_edit = Column(Boolean, default=False)  # False = view only
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
 
 class UserDashboardAccess(Base):
     """User access to specific dashboards"""
@@ -66,7 +87,7 @@ class UserDashboardAccess(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     dashboard_id = Column(Integer, ForeignKey("dashboards.id", ondelete="CASCADE"), nullable=False)
     can_edit = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
 
 # ============================================
 # CONNECTIONS
@@ -84,8 +105,8 @@ class Connection(Base):
     password_encrypted = Column(Text, nullable=False)
     ssl_enabled = Column(Boolean, default=False)
     pool_size = Column(Integer, default=5)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
 
 # ============================================
 # REPORTS
@@ -137,8 +158,8 @@ class Report(Base):
     
     # Metadata
     created_by = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
 
 # ============================================
 # DASHBOARDS
@@ -157,8 +178,8 @@ class Dashboard(Base):
     visibility = Column(String(50), default="private")
     
     created_by = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
 
 class DashboardWidget(Base):
     __tablename__ = "dashboard_widgets"
@@ -170,7 +191,7 @@ class DashboardWidget(Base):
     title = Column(String(255))
     config = Column(JSON, default={})
     position = Column(JSON, default={})  # {x, y, w, h}
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
 
 # ============================================
 # INITIALIZATION
@@ -190,9 +211,14 @@ async def init_db():
         from sqlalchemy import select
         from app.core.security import get_password_hash
 
+        # Fetch both bootstrap accounts in a single round-trip
+        result = await session.execute(
+            select(User).where(User.username.in_(("infostudio", "admin")))
+        )
+        accounts = {u.username: u for u in result.scalars()}
+
         # 1. Create/ensure SUPERUSER account (infostudio)
-        result = await session.execute(select(User).where(User.username == "infostudio"))
-        superuser = result.scalar_one_or_none()
+        superuser = accounts.get("infostudio")
 
         if not superuser:
             superuser = User(
@@ -217,8 +243,7 @@ async def init_db():
                 logger.info("✅ Fixed superuser account protection")
 
         # 2. Migrate old 'admin' account if exists (backward compatibility)
-        result = await session.execute(select(User).where(User.username == "admin"))
-        old_admin = result.scalar_one_or_none()
+        old_admin = accounts.get("admin")
 
         if old_admin:
             # Keep admin account but downgrade to 'admin' role (not superuser)
@@ -230,3 +255,14 @@ async def get_db():
     """Dependency for database session"""
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def close_db():
+    """Refresh SQLite planner statistics and release the engine on shutdown"""
+    if engine.dialect.name == "sqlite":
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("PRAGMA optimize"))
+        except Exception as e:
+            logger.warning(f"PRAGMA optimize failed: {e}")
+    await engine.dispose()
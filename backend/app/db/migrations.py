@@ -12,18 +12,46 @@ logger = logging.getLogger(__name__)
 
 
 async def run_migrations(session: AsyncSession):
-    """Esegue tutte le migrazioni necessarie"""
+    """
+    Esegue le migrazioni non ancora applicate.
+
+    La versione dello schema è salvata in schema_migrations: a DB aggiornato
+    il boot fa una sola SELECT e non tocca la tabella users.
+    """
 
     migrations = [
         migrate_add_user_permission_columns,
         migrate_fix_infostudio_system_account,
     ]
+    current_version = len(migrations)
 
-    for migration in migrations:
+    await session.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    applied = (await session.execute(
+        text("SELECT MAX(version) FROM schema_migrations")
+    )).scalar() or 0
+    if applied >= current_version:
+        await session.commit()
+        return
+
+    # Tutte le migrazioni pendenti in un'unica transazione
+    for version, migration in enumerate(migrations, start=1):
+        if version <= applied:
+            continue
         try:
             await migration(session)
         except Exception as e:
+            # Non registriamo la versione: verrà ritentata al prossimo avvio
             logger.warning(f"Migration {migration.__name__}: {e}")
+            break
+        await session.execute(
+            text("INSERT INTO schema_migrations (version) VALUES (:v)"),
+            {"v": version}
+        )
+
+    await session.commit()
 
 
 async def migrate_add_user_permission_columns(session: AsyncSession):
@@ -47,8 +75,6 @@ async def migrate_add_user_permission_columns(session: AsyncSession):
         ))
         logger.info("✅ Added column: users.created_by")
 
-    await session.commit()
-
 
 async def migrate_fix_infostudio_system_account(session: AsyncSession):
     """Assicura che infostudio abbia is_system_account=1"""
@@ -64,5 +90,3 @@ async def migrate_fix_infostudio_system_account(session: AsyncSession):
     await session.execute(text(
         "UPDATE users SET is_system_account = 0 WHERE username != 'infostudio' AND is_system_account = 1"
     ))
-
-    await session.commit()
@@ -2,15 +2,16 @@
 INFOBI 4.0 - High Performance BI Platform
 Focus: Speed, Mobile, Industry 4.0
 """
+import asyncio
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import ORJSONResponse
 
 from app.core.config import settings
-from app.db.database import init_db
+from app.db.database import init_db, close_db
 from app.api import auth, connections, reports, pivot, dashboards, export, users
 
 # Configure logging
@@ -24,16 +25,22 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("✅ Database initialized")
 
-    # Warm-up database connections to eliminate cold start delays
+    # Warm-up database connections in background: the app starts serving
+    # immediately and /ready reports 503 until the pools are primed
     from app.core.warmup import warm_up_connections
-    await warm_up_connections()
+    app.state.warmup_done = asyncio.Event()
+    app.state.warmup_task = asyncio.create_task(warm_up_connections(app.state.warmup_done))
 
     yield
 
+    if not app.state.warmup_task.done():
+        app.state.warmup_task.cancel()
+
     # Cleanup: dispose all connection pools
     logger.info("🔌 Disposing connection pools...")
     from app.core.engine_pool import close_all_pools
     close_all_pools()
+    await close_db()
     logger.info("👋 Shutting down INFOBI 4.0")
 
 app = FastAPI(
@@ -52,7 +59,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Query-Time", "X-Cache-Hit", "X-Row-Count"],
+    expose_headers=["X-Query-Time", "X-Cache-Hit", "X-Row-Count", "X-Row-Limit", "X-Total-Count"],
 )
 
 # Include routers
@@ -68,6 +75,14 @@ app.include_router(export.router, prefix="/api/export", tags=["Export"])
 async def health():
     return {"status": "healthy", "version": "4.0.0"}
 
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness probe: 503 until the startup warm-up has completed"""
+    warmup_done = getattr(request.app.state, "warmup_done", None)
+    if warmup_done is None or not warmup_done.is_set():
+        return ORJSONResponse({"status": "warming_up"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ready"}
+
 @app.get("/")
 async def root():
     return {"message": "INFOBI 4.0 - High Performance BI", "docs": "/docs"}
@@ -1,7 +1,10 @@
 """Pydantic schemas for API validation"""
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+
+# Response models are read-only snapshots of ORM rows
+RESPONSE_MODEL_CONFIG = ConfigDict(from_attributes=True, frozen=True)
 
 # Auth
 class LoginRequest(BaseModel):
@@ -19,9 +22,8 @@ class UserResponse(BaseModel):
     email: Optional[str]
     role: str
     is_active: bool
-    
-    class Config:
-        from_attributes = True
+
+    model_config = RESPONSE_MODEL_CONFIG
 
 # Connections
 class ConnectionCreate(BaseModel):
@@ -53,9 +55,8 @@ class ConnectionResponse(BaseModel):
     username: str
     ssl_enabled: bool
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = RESPONSE_MODEL_CONFIG
 
 # Reports
 class ColumnConfig(BaseModel):
@@ -110,23 +111,24 @@ class ReportResponse(BaseModel):
     description: Optional[str]
     connection_id: int
     query: str
-    columns_config: Optional[List[dict]] = []
-    perspective_config: Optional[Dict[str, Any]] = {}
-    tabulator_config: Optional[Dict[str, Any]] = {}
-    default_group_by: Optional[List[str]] = []
-    default_metrics: Optional[List[dict]] = []
-    available_metrics: Optional[List[dict]] = []
-    column_labels: Optional[Dict[str, str]] = {}
-    view_config: Optional[Dict[str, Any]] = {}
-    layout: Optional[Dict[str, Any]] = {}
+    # Structured fields use concrete models (they are written through
+    # ReportCreate/ReportUpdate); only the free-form configs stay Dict[str, Any]
+    columns_config: Optional[List[ColumnConfig]] = Field(default_factory=list)
+    perspective_config: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    tabulator_config: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    default_group_by: Optional[List[str]] = Field(default_factory=list)
+    default_metrics: Optional[List[MetricDefinition]] = Field(default_factory=list)
+    available_metrics: Optional[List[MetricDefinition]] = Field(default_factory=list)
+    column_labels: Optional[Dict[str, str]] = Field(default_factory=dict)
+    view_config: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    layout: Optional[Dict[str, Any]] = Field(default_factory=dict)
     cache_enabled: bool
     cache_ttl: int
     visibility: Optional[str] = "private"
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
-    
-    class Config:
-        from_attributes = True
+
+    model_config = RESPONSE_MODEL_CONFIG
 
 # Pivot Request
 class PivotRequest(BaseModel):
@@ -204,6 +206,5 @@ class DashboardResponse(BaseModel):
     refresh_interval: int
     widgets: List[dict] = []
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = RESPONSE_MODEL_CONFIG
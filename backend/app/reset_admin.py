@@ -8,7 +8,7 @@ sys.path.append(os.getcwd())
 
 from app.db.database import AsyncSessionLocal, User
 from app.core.security import get_password_hash
-from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
 
 # Configura logging
 logging.basicConfig(level=logging.INFO)
@@ -18,29 +18,22 @@ async def reset_admin_password():
     logger.info("🔄 Avvio reset password admin...")
     
     async with AsyncSessionLocal() as db:
-        # Cerca l'utente admin
-        result = await db.execute(select(User).where(User.username == "admin"))
-        user = result.scalar_one_or_none()
-        
         # Genera hash per "admin"
         new_password_hash = get_password_hash("admin")
-        
-        if user:
-            logger.info("✅ Utente 'admin' trovato. Aggiornamento password...")
-            user.password_hash = new_password_hash
-            user.is_active = True
-        else:
-            logger.info("⚠️ Utente 'admin' non trovato. Creazione nuovo utente...")
-            user = User(
-                username="admin",
-                email="admin@example.com",
-                full_name="Administrator",
-                password_hash=new_password_hash,
-                role="admin",
-                is_active=True
-            )
-            db.add(user)
-            
+
+        # Crea l'utente admin o ne aggiorna la password in un'unica UPSERT
+        stmt = insert(User).values(
+            username="admin",
+            email="admin@example.com",
+            full_name="Administrator",
+            password_hash=new_password_hash,
+            role="admin",
+            is_active=True
+        ).on_conflict_do_update(
+            index_elements=["username"],
+            set_={"password_hash": new_password_hash, "is_active": True}
+        )
+        await db.execute(stmt)
         await db.commit()
         logger.info("✅ Password reset completata con successo!")
         logger.info("👉 Ora puoi accedere con: admin / admin")
@@ -3,9 +3,12 @@ Redis/Dragonfly Cache Service
 - Caches query results as Arrow IPC
 - Caches pivot aggregations
 - Sub-millisecond retrieval
+- Short-lived in-process copy of hot pivot results and raw report data
 """
 import hashlib
 import logging
+import time
+from collections import OrderedDict
 from typing import Optional
 import redis.asyncio as redis
 from app.core.config import settings
@@ -15,6 +18,9 @@ logger = logging.getLogger(__name__)
 class CacheService:
     def __init__(self):
         self.redis: Optional[redis.Redis] = None
+        # key -> (data, row_count, expires_at), in LRU order
+        self._local: OrderedDict = OrderedDict()
+        self._local_bytes = 0
     
     async def connect(self):
         """Connect to Redis/Dragonfly"""
@@ -35,7 +41,7 @@ class CacheService:
     def make_key(prefix: str, *args) -> str:
         """Create cache key from components"""
         content = ":".join(str(a) for a in args)
-        hash_val = hashlib.md5(content.encode()).hexdigest()[:12]
+        hash_val = hashlib.blake2b(content.encode(), digest_size=6).hexdigest()
         return f"infobi:{prefix}:{hash_val}"
     
     async def get(self, key: str) -> Optional[bytes]:
@@ -71,29 +77,110 @@ class CacheService:
         except Exception as e:
             logger.warning(f"Cache DELETE error: {e}")
     
-    async def get_pivot(self, report_id: int, config_hash: str) -> Optional[bytes]:
-        """Get cached pivot result"""
-        key = self.make_key("pivot", report_id, config_hash)
-        return await self.get(key)
-    
-    async def set_pivot(self, report_id: int, config_hash: str, data: bytes):
-        """Cache pivot result (shorter TTL)"""
-        key = self.make_key("pivot", report_id, config_hash)
-        await self.set(key, data, settings.CACHE_TTL_PIVOT)
-    
+    @staticmethod
+    def report_key(prefix: str, report_id: int, config_hash: str) -> str:
+        """
+        Cache key for report-scoped data.
+        report_id stays in clear so invalidate_report() can match it by pattern.
+        """
+        return f"infobi:{prefix}:{report_id}:{config_hash}"
+
+    def _local_get(self, key: str) -> Optional[tuple]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            self._local_pop(key)
+            return None
+        self._local.move_to_end(key)
+        return entry
+
+    def _local_pop(self, key: Optional[str] = None):
+        """Drop key (or the least recently used entry) from the local cache"""
+        if key is None:
+            _, entry = self._local.popitem(last=False)
+        else:
+            entry = self._local.pop(key)
+        self._local_bytes -= len(entry[0])
+
+    def _local_set(self, key: str, data: bytes, row_count: int, ttl: Optional[int] = None):
+        """
+        Keep a reference to the result for CACHE_LOCAL_TTL seconds, so dashboards
+        polling the same pivot skip the Redis round-trip. The buffer is shared,
+        not copied: every hit serves the same memory.
+        Bounded by CACHE_LOCAL_MAX_ITEMS entries and CACHE_LOCAL_MAX_BYTES in total.
+        """
+        local_ttl = min(settings.CACHE_LOCAL_TTL, ttl or settings.CACHE_LOCAL_TTL)
+        if local_ttl <= 0 or len(data) > settings.CACHE_LOCAL_MAX_BYTES:
+            return
+        if key in self._local:
+            self._local_pop(key)
+        self._local[key] = (data, row_count, time.monotonic() + local_ttl)
+        self._local_bytes += len(data)
+        while len(self._local) > settings.CACHE_LOCAL_MAX_ITEMS or self._local_bytes > settings.CACHE_LOCAL_MAX_BYTES:
+            self._local_pop()
+
+    async def get_pivot(self, report_id: int, config_hash: str) -> tuple[Optional[bytes], int]:
+        """Get cached pivot result and its row count (-1 if unknown)"""
+        key = self.report_key("pivot", report_id, config_hash)
+        local = self._local_get(key)
+        if local:
+            logger.debug(f"Cache HIT (local): {key}")
+            return local[0], local[1]
+        await self.connect()
+        try:
+            data, rows = await self.redis.mget(key, f"{key}:rows")
+            row_count = int(rows) if rows is not None else -1
+            if data:
+                logger.debug(f"Cache HIT: {key}")
+                self._local_set(key, data, row_count)
+            return data, row_count
+        except Exception as e:
+            logger.warning(f"Cache GET error: {e}")
+            return None, -1
+
+    async def set_pivot(self, report_id: int, config_hash: str, data: bytes, row_count: int = -1, ttl: int = None):
+        """Cache pivot result and its row count (shorter TTL by default)"""
+        await self.connect()
+        key = self.report_key("pivot", report_id, config_hash)
+        ttl = ttl or settings.CACHE_TTL_PIVOT
+        self._local_set(key, data, row_count, ttl)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, data)
+                pipe.setex(f"{key}:rows", ttl, row_count)
+                await pipe.execute()
+            logger.debug(f"Cache SET: {key} (TTL: {ttl}s)")
+        except Exception as e:
+            logger.warning(f"Cache SET error: {e}")
+
     async def get_query(self, report_id: int, query_hash: str) -> Optional[bytes]:
-        """Get cached query result"""
-        key = self.make_key("query", report_id, query_hash)
-        return await self.get(key)
+        """
+        Get cached query result. The raw data is also kept locally for a few
+        seconds: consecutive pivots/drills over the same report read it
+        in-process instead of transferring it from Redis each time.
+        """
+        key = self.report_key("query", report_id, query_hash)
+        local = self._local_get(key)
+        if local:
+            logger.debug(f"Cache HIT (local): {key}")
+            return local[0]
+        data = await self.get(key)
+        if data:
+            self._local_set(key, data, -1)
+        return data
     
     async def set_query(self, report_id: int, query_hash: str, data: bytes):
         """Cache query result"""
-        key = self.make_key("query", report_id, query_hash)
+        key = self.report_key("query", report_id, query_hash)
+        self._local_set(key, data, -1)
         await self.set(key, data, settings.CACHE_TTL)
     
     async def invalidate_report(self, report_id: int):
         """Invalidate all caches for a report"""
-        await self.delete(f"*:{report_id}:*")
+        for key in [k for k in self._local if k.split(":")[2] == str(report_id)]:
+            self._local_pop(key)
+        await self.delete(f"*:{report_id}")
 
 # Singleton instance
 cache = CacheService()
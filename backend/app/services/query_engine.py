@@ -3,43 +3,628 @@ High-Performance Query Engine
 - SQLAlchemy Connection Pooling: Pre-warmed connections eliminate cold start
 - Polars DataFrame: Blazing fast in-memory operations
 - Arrow IPC: Zero-copy binary serialization
-- ThreadPoolExecutor: Non-blocking async DB queries
+- Dedicated thread pool + Semaphore: Non-blocking, bounded async DB queries
 """
 import logging
 import hashlib
 import time
 import asyncio
-from typing import Optional, List, Dict, Any
+import re
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import orjson
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Iterator, AsyncIterator
 import polars as pl
 import pyarrow as pa
 import pyarrow.ipc as ipc
 from io import BytesIO
 from sqlalchemy import text
 from app.models.schemas import GridRequest, PivotDrillRequest
+from app.core.config import settings
 from app.core.engine_pool import get_engine
 
 logger = logging.getLogger(__name__)
 
-# Thread pool for blocking DB operations
-# Conservative: 4 workers to avoid pool exhaustion
-_executor = ThreadPoolExecutor(max_workers=4)
+# Bounds concurrent blocking DB operations (sized by QUERY_CONCURRENCY).
+# Created on first use so it binds to the running event loop.
+_query_semaphore: Optional[asyncio.Semaphore] = None
 
-# Track which connections have been warmed this session
-_warmed_connections: set = set()
+# Per target database limit (QUERY_CONCURRENCY_PER_DB), so one slow server
+# cannot hold every global slot and stall queries to the other databases
+_db_semaphores: Dict[tuple, asyncio.Semaphore] = {}
 
 
+# One worker thread per QUERY_CONCURRENCY slot. The default executor behind
+# asyncio.to_thread is sized by CPU count (and shared with everything else),
+# so on small hosts it would cap concurrent queries below the semaphore
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.QUERY_CONCURRENCY,
+    thread_name_prefix="qe-db"
+)
+
+
+async def _run_blocking(func, *args):
+    """Run a blocking DB call in a worker thread, at most QUERY_CONCURRENCY at a time"""
+    global _query_semaphore
+    if _query_semaphore is None:
+        _query_semaphore = asyncio.Semaphore(settings.QUERY_CONCURRENCY)
+    async with _query_semaphore:
+        return await asyncio.get_running_loop().run_in_executor(_db_executor, func, *args)
+
+
+async def _run_query(func, db_type: str, config: dict, *args):
+    """_run_blocking for a query against (db_type, config), also bounded per database"""
+    key = (db_type, config['host'], config.get('port'), config['database'])
+    semaphore = _db_semaphores.get(key)
+    if semaphore is None:
+        semaphore = _db_semaphores[key] = asyncio.Semaphore(settings.QUERY_CONCURRENCY_PER_DB)
+    async with semaphore:
+        return await _run_blocking(func, db_type, config, *args)
+
+
+# Tables below this size are written as a single IPC record batch;
+# larger ones in batches of about _IPC_BATCH_BYTES (at most _IPC_BATCH_ROWS
+# rows) to bound per-message memory and keep each batch cache-resident
+_IPC_SINGLE_BATCH_BYTES = 8 * 1024 * 1024
+_IPC_BATCH_BYTES = 1024 * 1024
+_IPC_BATCH_ROWS = 65536
+
+
+def _ipc_batch_rows(table: pa.Table) -> int:
+    """Rows per record batch for ~_IPC_BATCH_BYTES batches, from the average row width"""
+    row_bytes = table.nbytes // table.num_rows if table.num_rows else 0
+    if not row_bytes:
+        return _IPC_BATCH_ROWS
+    return max(1024, min(_IPC_BATCH_ROWS, _IPC_BATCH_BYTES // row_bytes))
+
+
+def _to_ipc_bytes(table: pa.Table) -> memoryview:
+    """
+    Serialize an Arrow table to an IPC stream.
+    The IPC writer fills an Arrow-owned buffer (no BytesIO resize/copy cycles)
+    which is returned as a zero-copy memoryview: ArrowResponse and the Redis
+    client both accept it without materializing a bytes copy.
+    """
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        if table.nbytes < _IPC_SINGLE_BATCH_BYTES:
+            # Results assembled from many small chunks go out as one message
+            writer.write_table(table.combine_chunks())
+        else:
+            writer.write_table(table, max_chunksize=_ipc_batch_rows(table))
+    return memoryview(sink.getvalue())
+
+
+# Tables above this size are serialized in a worker thread
+_IPC_OFFLOAD_BYTES = 1024 * 1024
+
+
+async def _to_ipc_bytes_async(table: pa.Table) -> memoryview:
+    """
+    _to_ipc_bytes for the async paths: large results are encoded in a worker
+    thread (default executor, not the DB pool, so it never waits behind
+    queries) instead of blocking the event loop; small pages inline, where
+    the thread hop would cost more than the encode.
+    """
+    if table.nbytes < _IPC_OFFLOAD_BYTES:
+        return _to_ipc_bytes(table)
+    return await asyncio.to_thread(_to_ipc_bytes, table)
+
+
+def _iter_ipc_batches(schema: pa.Schema, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """
+    Write record batches to an IPC stream as they are produced, yielding the
+    bytes of each one: memory stays bounded by a single batch.
+    """
+    sink = BytesIO()
+
+    def drain() -> bytes:
+        chunk = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return chunk
+
+    try:
+        with ipc.new_stream(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                yield drain()
+        # Schema-only stream for empty tables + end-of-stream marker
+        yield drain()
+    finally:
+        # Closed early (client gone): release the source (DB cursor) now
+        close = getattr(batches, "close", None)
+        if close:
+            close()
+
+
+def _stream_schema(data: Dict[str, list]) -> pa.Schema:
+    """
+    Schema of a streamed result, inferred from its first batch of rows.
+    Decimals are widened to the max precision and columns that are all NULL
+    in the batch are sent as strings, so later batches fit the same schema.
+    """
+    return pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_null(f.type)
+        else pa.field(f.name, pa.decimal128(38, f.type.scale)) if pa.types.is_decimal(f.type)
+        else f
+        for f in pa.RecordBatch.from_pydict(data).schema
+    ])
+
+
+def _conform_batch(data: Dict[str, list], schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Build a record batch of a streamed result against the stream schema.
+    Each column is inferred from its own values and cast to the schema type,
+    so a batch inferred differently (e.g. all NULL then text, int then
+    Decimal) still fits; a value the cast would lose raises ValueError
+    instead of being truncated.
+    """
+    arrays = []
+    for field in schema:
+        values = data[field.name]
+        if pa.types.is_string(field.type):
+            # Text columns take anything (e.g. NULL-only in the first batch)
+            try:
+                arrays.append(pa.array(values, type=pa.string()))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+            continue
+        try:
+            array = pa.array(values)
+            arrays.append(array if array.type == field.type else array.cast(field.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise ValueError(
+                f"Column '{field.name}' changed type mid-result and cannot be sent as {field.type}: {e}"
+            ) from e
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+# End marker of a chunk iterator driven through _run_query
+_END_OF_CHUNKS = object()
+
+
+def _next_chunk(_db_type: str, _config: dict, chunks: Iterator[bytes]):
+    """Adapter for _run_query (which passes db_type/config first): next chunk or _END_OF_CHUNKS"""
+    return next(chunks, _END_OF_CHUNKS)
+
+
+async def _prefetch_chunks(
+    chunks: Iterator[bytes],
+    db_type: str,
+    config: dict,
+    depth: int = 2
+) -> AsyncIterator[bytes]:
+    """
+    Drive a blocking chunk iterator (DB cursor + IPC writer) through
+    _run_query, keeping up to depth chunks ready: the next batch is fetched
+    and serialized while the previous one is still being sent to the client.
+    Every fetch goes through the DB executor and semaphores like any query.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=depth)
+    stopped = False
+
+    async def produce() -> None:
+        item = _END_OF_CHUNKS
+        try:
+            while not stopped:
+                chunk = await _run_query(_next_chunk, db_type, config, chunks)
+                if chunk is _END_OF_CHUNKS:
+                    break
+                await queue.put(chunk)
+        except Exception as e:
+            item = e
+        if not stopped:
+            await queue.put(item)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while (item := await queue.get()) is not _END_OF_CHUNKS:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Client gone or error: let the fetch in flight finish (the generator
+        # cannot be closed while a worker is running it), unblocking a
+        # pending put, then release the DB connection held by the cursor
+        stopped = True
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
+        close = getattr(chunks, "close", None)
+        if close:
+            await asyncio.to_thread(close)
+
+
+# Aggregate functions accepted in metric definitions (interpolated into SQL)
+ALLOWED_AGGREGATIONS = frozenset({'SUM', 'AVG', 'COUNT', 'MIN', 'MAX'})
+
+
+@dataclass(frozen=True)
+class SqlDialect:
+    """
+    SQL syntax of a target database, resolved once per request from db_type.
+    Frozen (hashable) so it can key the lru_cache'd SQL templates.
+    """
+    name: str
+
+    @property
+    def is_mssql(self) -> bool:
+        return self.name == "mssql"
+
+    @property
+    def like_ignores_case(self) -> bool:
+        """LIKE under the default collation: case-insensitive except on PostgreSQL"""
+        return self.name != "postgresql"
+
+    @property
+    def text_ignores_case(self) -> bool:
+        """
+        = and GROUP BY on text under the default collation: case-insensitive
+        on MSSQL/MySQL (*_CI_* / *_ci), case-sensitive elsewhere.
+        """
+        return self.name in ("mssql", "mysql")
+
+    def quote(self, ident: str) -> str:
+        """
+        Quote an identifier, doubling any embedded closing quote char so it
+        cannot break out ([x] on MSSQL, `x` on MySQL, "x" elsewhere).
+        """
+        if self.name == "mssql":
+            return "[" + ident.replace("]", "]]") + "]"
+        if self.name == "mysql":
+            return "`" + ident.replace("`", "``") + "`"
+        return '"' + ident.replace('"', '""') + '"'
+
+
+_DIALECTS = {name: SqlDialect(name) for name in ("mssql", "postgresql", "mysql")}
+
+
+def get_dialect(db_type: str) -> SqlDialect:
+    """Shared SqlDialect instance for a connection db_type"""
+    return _DIALECTS.get(db_type) or SqlDialect(db_type)
+
+
+def _pivot_sql_template(dialect: SqlDialect, grouped: bool, has_limit: bool, rollup: bool = False) -> str:
+    """
+    SQL skeleton for a pivot shape, with {select}, {base_query}, {where} and
+    {group} placeholders.
+    """
+    top = "TOP (:row_limit) " if dialect.is_mssql and has_limit else ""
+    parts = [
+        f"SELECT {top}{{select}}",
+        "FROM ({base_query}) AS base_data",
+        "{where}",
+    ]
+    if grouped and rollup:
+        # MySQL has no ROLLUP() grouping element, only the WITH ROLLUP modifier
+        group = "{group} WITH ROLLUP" if dialect.name == "mysql" else "ROLLUP({group})"
+        parts += [f"GROUP BY {group}", "ORDER BY {group}"]
+    elif grouped:
+        parts += ["GROUP BY {group}", "ORDER BY {group}"]
+    if has_limit and not dialect.is_mssql:
+        parts.append("LIMIT :row_limit")
+    return "\n".join(parts)
+
+
+# Placeholder for the base query in cached pivot SQL (never valid SQL text)
+_BASE_QUERY_MARK = "\x00base_query\x00"
+
+
+@lru_cache(maxsize=256)
+def _build_pivot_sql(
+    dialect: SqlDialect,
+    group_by: tuple,
+    metrics_key: tuple,
+    where_sql: str,
+    has_limit: bool,
+    rollup: bool = False
+) -> tuple[str, str]:
+    """
+    Build the grouped pivot SQL for one shape (dialect, group_by, metrics,
+    filter clause, limit), split around the base query: callers run
+    prefix + base_query + suffix. Filter values and the limit are bound
+    parameters, so warm dashboards hit the cache on every refresh.
+    metrics_key holds each metric dict as a tuple of its items.
+
+    With rollup, every subtotal level is computed in the same scan and a
+    GROUPING() flag __g_<col> marks the rows where <col> is rolled up.
+    """
+    select_parts = []
+
+    # Group by columns
+    for col in group_by:
+        select_parts.append(dialect.quote(col))
+
+    # Metrics with aggregations
+    for m in map(dict, metrics_key):
+        if m.get('type') == 'margin':
+            # Margin formula: (revenue - cost) / revenue * 100
+            rev = dialect.quote(m.get('revenueField') or m.get('field') or 'Venduto')
+            cost = dialect.quote(m.get('costField') or 'Costo')
+            col_name = dialect.quote(m.get('name', 'MarginePerc'))
+            select_parts.append(
+                f'CASE WHEN SUM({rev}) = 0 THEN 0 '
+                f'ELSE ROUND(CAST((SUM({rev}) - SUM({cost})) * 100.0 / SUM({rev}) AS DECIMAL(10,2)), 2) '
+                f'END AS {col_name}'
+            )
+        else:
+            agg = m.get('aggregation', 'SUM').upper()
+            field = m.get('field', '')
+            name = m.get('name', field)
+            if field:
+                if agg not in ALLOWED_AGGREGATIONS:
+                    raise ValueError(f"Unsupported aggregation: {agg}")
+                # FIX: Handle COUNT(*) correctly without quoting *
+                if field == '*':
+                    select_parts.append(f'{agg}(*) AS {dialect.quote(name)}')
+                else:
+                    select_parts.append(f'{agg}({dialect.quote(field)}) AS {dialect.quote(name)}')
+
+    # Subtotal flags (1 = rolled up), so subtotal rows are not confused with NULL keys
+    if rollup:
+        for col in group_by:
+            select_parts.append(f'GROUPING({dialect.quote(col)}) AS {dialect.quote("__g_" + col)}')
+
+    # If no select parts, select all
+    if not select_parts:
+        select_parts = ['*']
+
+    sql = _pivot_sql_template(dialect, bool(group_by), has_limit, rollup).format(
+        select=', '.join(select_parts),
+        base_query=_BASE_QUERY_MARK,
+        where=where_sql,
+        group=', '.join(dialect.quote(col) for col in group_by)
+    )
+    prefix, suffix = sql.split(_BASE_QUERY_MARK, 1)
+    return prefix, suffix
+
+
+@lru_cache(maxsize=1024)
+def _text(sql: str):
+    """
+    TextClause for a SQL string, built once per distinct statement: text()
+    scans the string for :param binds on construction, and the generated SQL
+    only depends on the query shape (values are always bound)
+    """
+    return text(sql)
+
+
+@lru_cache(maxsize=512)
+def _build_drill_sql(
+    dialect: SqlDialect,
+    group_col: str,
+    pivot_cols: tuple,
+    value_cols: tuple,
+    sort_key: tuple,
+    where_sql: str,
+    having_sql: str
+) -> tuple[str, str]:
+    """
+    Build the paginated GROUP BY of one drill-down level, split around the
+    base query like _build_pivot_sql. value_cols holds (colId, AGG) pairs,
+    sort_key (colId, descending) pairs; offset and page size are bound as
+    :row_offset / :row_limit, and each row carries the group count as __total.
+    """
+    # Every identifier is sanitized and quoted once, through the dialect
+    quote = dialect.quote
+    group_ref = quote(_sanitize_column_name(group_col))
+    select_parts = [f"{group_ref} AS key_val"] # Key column used for tree structure
+    group_by_parts = [group_ref]
+
+    # Support for Split By (Pivot Columns)
+    # If pivotCols are present, we must include them in SELECT and GROUP BY
+    for pivot_col in pivot_cols:
+        pivot_ref = quote(_sanitize_column_name(pivot_col))
+        select_parts.append(f"{pivot_ref} AS {pivot_ref}")
+        group_by_parts.append(pivot_ref)
+
+    for col_id, agg in value_cols:
+        col_ref = quote(_sanitize_column_name(col_id))
+        if agg not in ALLOWED_AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation: {agg}")
+        if agg == 'COUNT':
+            select_parts.append(f"COUNT(*) AS {col_ref}")
+        else:
+            # Basic SUM, AVG, MIN, MAX
+            select_parts.append(f"{agg}({col_ref}) AS {col_ref}")
+
+    # Build ORDER BY
+    # The group column is aliased as 'key_val' in the inner query, and only
+    # columns of the grouped output can be sorted on: key_val, the pivot
+    # columns and the aggregated value columns. Deeper rowGroupCols are not
+    # part of this level's output.
+    available_sort_cols = {group_col, 'key_val', *pivot_cols, *(c for c, _ in value_cols)}
+    order_clauses = []
+    for col_id, descending in sort_key:
+        # Skip columns that don't exist in the grouped output
+        if col_id not in available_sort_cols:
+            logger.debug("Skipping sort column '%s' - not in grouped output", col_id)
+            continue
+        # Map group column to its alias 'key_val', quote the others
+        # (sanitized) exactly as they are aliased in the SELECT
+        sort_ref = "key_val" if col_id in (group_col, 'key_val') else quote(_sanitize_column_name(col_id))
+        order_clauses.append(f"{sort_ref} {'DESC' if descending else 'ASC'}")
+    # Default (or fallback if all sort columns were invalid): sort by key
+    order_sql = "ORDER BY " + ", ".join(order_clauses or ["key_val ASC"])
+
+    page_sql = _page_sql(dialect)
+
+    # Sorted by the group key only and no HAVING: the grouped SELECT is
+    # paged directly, so the DB can stream groups in key order (index scan +
+    # group aggregate) instead of materializing them for an outer sort.
+    # The window COUNT is evaluated after GROUP BY, so it still counts groups
+    if not having_sql and all(c in (group_col, 'key_val') for c, _ in sort_key):
+        sql = "\n".join([
+            f"SELECT {', '.join(select_parts)}, COUNT(*) OVER () AS __total",
+            f"FROM ({_BASE_QUERY_MARK}) AS base",
+            where_sql,
+            f"GROUP BY {', '.join(group_by_parts)}",
+            order_sql,
+            page_sql,
+        ])
+        prefix, suffix = sql.split(_BASE_QUERY_MARK, 1)
+        return prefix, suffix
+
+    # WRAP QUERY to ensure aliases are valid in ORDER BY and Pagination.
+    # The window COUNT returns the number of groups on every row: the grouped
+    # set is materialized for the ORDER BY anyway, so it costs no extra scan
+    sql = "\n".join([
+        "SELECT drill_tbl.*, COUNT(*) OVER () AS __total FROM (",
+        f"SELECT {', '.join(select_parts)}",
+        f"FROM ({_BASE_QUERY_MARK}) AS base",
+        where_sql,
+        f"GROUP BY {', '.join(group_by_parts)}",
+        having_sql,
+        ") AS drill_tbl",
+        order_sql,
+        page_sql,
+    ])
+    prefix, suffix = sql.split(_BASE_QUERY_MARK, 1)
+    return prefix, suffix
+
+
+def validate_pivot_fields(
+    columns_config: Optional[List[Dict[str, Any]]],
+    fields: List[str]
+) -> None:
+    """
+    Check that every referenced field is a column of the report.
+    Raises ValueError on the first unknown one. Skipped when the report has
+    no columns_config saved (older reports), as there is nothing to check against.
+    """
+    if not columns_config:
+        return
+    allowed = {c.get('name') for c in columns_config}
+    for field in fields:
+        if field and field != '*' and field not in allowed:
+            raise ValueError(f"Unknown column: {field}")
+
+
+_LEADING_SELECT = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?", re.IGNORECASE)
+_SELECT_KEYWORD = re.compile(r"\bSELECT\b", re.IGNORECASE)
+# Anything that makes appending/injecting a row cap unsafe: existing caps,
+# set operations, CTEs, SELECT INTO, locking clauses, comments, batches
+_NOT_LIMITABLE = re.compile(
+    r"\b(TOP|LIMIT|OFFSET|FETCH|UNION|INTERSECT|EXCEPT|WITH|INTO|FOR)\b|--|/\*|;",
+    re.IGNORECASE
+)
+
+
+def _inline_row_limit(query: str, dialect: SqlDialect) -> Optional[str]:
+    """
+    Apply the :row_limit cap directly to a simple single-SELECT query
+    (TOP after SELECT [DISTINCT] on MSSQL, trailing LIMIT elsewhere), so the
+    optimizer can stop the scan early instead of limiting a derived table.
+    Returns None when the query is not trivially rewritable: callers then
+    keep the SELECT ... FROM (query) wrapper.
+    """
+    if not settings.INLINE_ROW_LIMIT:
+        return None
+    match = _LEADING_SELECT.match(query)
+    if not match or len(_SELECT_KEYWORD.findall(query)) != 1 or _NOT_LIMITABLE.search(query):
+        return None
+    if dialect.is_mssql:
+        return f"{query[:match.end()]}TOP (:row_limit) {query[match.end():]}"
+    return f"{query.rstrip()} LIMIT :row_limit"
+
+
+# Anything but (Unicode) letters, digits, underscore and space
+_UNSAFE_COLUMN_CHARS = re.compile(r"[^\w ]")
+
+
+@lru_cache(maxsize=4096)
 def _sanitize_column_name(col: str) -> str:
     """
     Validate column name - only allow alphanumeric, underscore, and spaces.
     Prevents SQL injection via column names.
+    Column names repeat on every request, so results are memoized.
+    """
+    return _UNSAFE_COLUMN_CHARS.sub("", col)
+
+
+def _order_by_sql(sort_model, dialect: SqlDialect) -> str:
+    """
+    ORDER BY for an AG Grid sortModel (columns sanitized and quoted).
+    MSSQL gets a neutral ORDER BY when unsorted, as OFFSET/FETCH requires one.
+    """
+    order_clauses = [
+        f"{dialect.quote(_sanitize_column_name(sort.colId))} {'DESC' if sort.sort == 'desc' else 'ASC'}"
+        for sort in sort_model
+    ]
+    if order_clauses:
+        return "ORDER BY " + ", ".join(order_clauses)
+    return "ORDER BY (SELECT NULL)" if dialect.is_mssql else ""
+
+
+def _page_sql(dialect: SqlDialect) -> str:
+    """Pagination clause with the offset and page size bound as :row_offset / :row_limit"""
+    if dialect.is_mssql:
+        # MSSQL requires Order By for offset
+        return "OFFSET :row_offset ROWS FETCH NEXT :row_limit ROWS ONLY"
+    return "LIMIT :row_limit OFFSET :row_offset"
+
+
+# Filter type -> (SQL operator, transform applied to the bound value)
+_FILTER_OPS = {
+    'contains': ('LIKE', lambda v: f"%{v}%"),
+    'notContains': ('NOT LIKE', lambda v: f"%{v}%"),
+    'startsWith': ('LIKE', lambda v: f"{v}%"),
+    'endsWith': ('LIKE', lambda v: f"%{v}"),
+    'equals': ('=', lambda v: v),
+    'notEqual': ('!=', lambda v: v),
+    'greaterThan': ('>', lambda v: v),
+    'lessThan': ('<', lambda v: v),
+    'greaterThanOrEqual': ('>=', lambda v: v),
+    'lessThanOrEqual': ('<=', lambda v: v),
+}
+
+# Filter types without a value
+_NULLARY_FILTERS = {
+    'isNull': 'IS NULL',
+    'isNotNull': 'IS NOT NULL',
+}
+
+# havingModel comparison type -> SQL operator
+_HAVING_OPS = {
+    'greaterThan': '>',
+    'greaterThanOrEqual': '>=',
+    'lessThan': '<',
+    'lessThanOrEqual': '<=',
+    'equals': '=',
+    'notEqual': '!=',
+}
+
+
+def _append_filter_condition(
+    conditions: List[str],
+    params: Dict[str, Any],
+    col_ref: str,
+    filter_type: str,
+    value: Any,
+    param_name: str
+) -> bool:
     """
-    return "".join(c for c in col if c.isalnum() or c in '_ ')
+    Append the condition for one filter (value bound as :param_name).
+    Returns True when param_name was used; unknown filter types are ignored.
+    """
+    nullary = _NULLARY_FILTERS.get(filter_type)
+    if nullary:
+        conditions.append(f"{col_ref} {nullary}")
+        return False
+    op = _FILTER_OPS.get(filter_type)
+    if op is None:
+        return False
+    sql_op, transform = op
+    conditions.append(f"{col_ref} {sql_op} :{param_name}")
+    params[param_name] = transform(value)
+    return True
 
 
 def _build_safe_filter_clause(
     filters: Dict[str, Any],
-    is_mssql: bool
+    dialect: SqlDialect
 ) -> tuple[str, Dict[str, Any]]:
     """
     Build a safe WHERE clause using parameterized queries.
@@ -58,60 +643,14 @@ def _build_safe_filter_clause(
 
     for field, filter_def in filters.items():
         # Sanitize column name
-        clean_field = _sanitize_column_name(field)
-        col = f'[{clean_field}]' if is_mssql else f'"{clean_field}"'
-
-        filter_type = filter_def.get('type', '')
-        value = filter_def.get('value')
-
-        if filter_type == 'contains':
-            param_name = f"p{param_counter}"
-            conditions.append(f"{col} LIKE :{param_name}")
-            params[param_name] = f"%{value}%"
-            param_counter += 1
+        col = dialect.quote(_sanitize_column_name(field))
 
-        elif filter_type == 'equals':
-            param_name = f"p{param_counter}"
-            conditions.append(f"{col} = :{param_name}")
-            params[param_name] = value
+        if _append_filter_condition(
+            conditions, params, col,
+            filter_def.get('type', ''), filter_def.get('value'), f"p{param_counter}"
+        ):
             param_counter += 1
 
-        elif filter_type == 'notEqual':
-            param_name = f"p{param_counter}"
-            conditions.append(f"{col} != :{param_name}")
-            params[param_name] = value
-            param_counter += 1
-
-        elif filter_type == 'greaterThan':
-            param_name = f"p{param_counter}"
-            conditions.append(f"{col} > :{param_name}")
-            params[param_name] = value
-            param_counter += 1
-
-        elif filter_type == 'lessThan':
-            param_name = f"p{param_counter}"
-            conditions.append(f"{col} < :{param_name}")
-            params[param_name] = value
-            param_counter += 1
-
-        elif filter_type == 'greaterThanOrEqual':
-            param_name = f"p{param_counter}"
-            conditions.append(f"{col} >= :{param_name}")
-            params[param_name] = value
-            param_counter += 1
-
-        elif filter_type == 'lessThanOrEqual':
-            param_name = f"p{param_counter}"
-            conditions.append(f"{col} <= :{param_name}")
-            params[param_name] = value
-            param_counter += 1
-
-        elif filter_type == 'isNotNull':
-            conditions.append(f"{col} IS NOT NULL")
-
-        elif filter_type == 'isNull':
-            conditions.append(f"{col} IS NULL")
-
     if conditions:
         return "WHERE " + " AND ".join(conditions), params
     return "", {}
@@ -121,7 +660,7 @@ def _build_drill_filter_clause(
     filter_model: Dict[str, Any],
     group_keys: List[Any],
     row_group_cols: List[str],
-    is_mssql: bool
+    dialect: SqlDialect
 ) -> tuple[List[str], Dict[str, Any]]:
     """
     Build safe WHERE clause conditions for drill-down queries.
@@ -137,9 +676,7 @@ def _build_drill_filter_clause(
 
     # 1. Parent Path Filters (Drill-Down constraints)
     for idx, key in enumerate(group_keys):
-        parent_col = row_group_cols[idx]
-        clean_col = _sanitize_column_name(parent_col)
-        col_ref = f'[{clean_col}]' if is_mssql else f'"{clean_col}"'
+        col_ref = dialect.quote(_sanitize_column_name(row_group_cols[idx]))
 
         param_name = f"gk{param_counter}"
         conditions.append(f"{col_ref} = :{param_name}")
@@ -148,62 +685,136 @@ def _build_drill_filter_clause(
 
     # 2. UI Filter Model
     for col, filter_def in filter_model.items():
-        clean_col = _sanitize_column_name(col)
-        col_ref = f'[{clean_col}]' if is_mssql else f'"{clean_col}"'
+        col_ref = dialect.quote(_sanitize_column_name(col))
 
         # filter_def has .filter and .type attributes (from PivotDrillRequest schema)
         filter_type = filter_def.type if hasattr(filter_def, 'type') else filter_def.get('type', '')
         value = filter_def.filter if hasattr(filter_def, 'filter') else filter_def.get('filter')
 
-        if filter_type == 'contains':
-            param_name = f"f{param_counter}"
-            conditions.append(f"{col_ref} LIKE :{param_name}")
-            params[param_name] = f"%{value}%"
+        if _append_filter_condition(
+            conditions, params, col_ref, filter_type, value, f"f{param_counter}"
+        ):
             param_counter += 1
 
-        elif filter_type == 'equals':
-            param_name = f"f{param_counter}"
-            conditions.append(f"{col_ref} = :{param_name}")
-            params[param_name] = value
-            param_counter += 1
+    return conditions, params
 
-        elif filter_type == 'notEqual':
-            param_name = f"f{param_counter}"
-            conditions.append(f"{col_ref} != :{param_name}")
-            params[param_name] = value
-            param_counter += 1
 
-        elif filter_type == 'greaterThan':
-            param_name = f"f{param_counter}"
-            conditions.append(f"{col_ref} > :{param_name}")
-            params[param_name] = value
-            param_counter += 1
+def _build_polars_filter(filters: Dict[str, Any], dialect: SqlDialect) -> Optional[pl.Expr]:
+    """
+    Polars equivalent of _build_safe_filter_clause, used when pivoting
+    cached data in-process. Text matching follows the case sensitivity of
+    the source dialect (SqlDialect.like_ignores_case / text_ignores_case),
+    so cached and SQL results do not differ. Returns None when there is
+    nothing to filter.
+    """
+    if not filters:
+        return None
 
-        elif filter_type == 'lessThan':
-            param_name = f"f{param_counter}"
-            conditions.append(f"{col_ref} < :{param_name}")
-            params[param_name] = value
-            param_counter += 1
+    def as_text(col: pl.Expr, value: Any, ignore_case: bool) -> tuple[pl.Expr, str]:
+        col = col.cast(pl.Utf8)
+        if ignore_case:
+            return col.str.to_lowercase(), str(value).lower()
+        return col, str(value)
 
-        elif filter_type == 'greaterThanOrEqual':
-            param_name = f"f{param_counter}"
-            conditions.append(f"{col_ref} >= :{param_name}")
-            params[param_name] = value
-            param_counter += 1
+    like_ci = dialect.like_ignores_case
+    conditions = []
+    for field, filter_def in filters.items():
+        col = pl.col(field)
+        filter_type = filter_def.get('type', '')
+        value = filter_def.get('value')
 
+        if filter_type == 'contains':
+            col, value = as_text(col, value, like_ci)
+            conditions.append(col.str.contains(value, literal=True))
+        elif filter_type == 'notContains':
+            col, value = as_text(col, value, like_ci)
+            conditions.append(~col.str.contains(value, literal=True))
+        elif filter_type == 'startsWith':
+            col, value = as_text(col, value, like_ci)
+            conditions.append(col.str.starts_with(value))
+        elif filter_type == 'endsWith':
+            col, value = as_text(col, value, like_ci)
+            conditions.append(col.str.ends_with(value))
+        elif filter_type in ('equals', 'notEqual') and isinstance(value, str) and dialect.text_ignores_case:
+            col, value = as_text(col, value, True)
+            conditions.append(col == value if filter_type == 'equals' else col != value)
+        elif filter_type == 'equals':
+            conditions.append(col == value)
+        elif filter_type == 'notEqual':
+            conditions.append(col != value)
+        elif filter_type == 'greaterThan':
+            conditions.append(col > value)
+        elif filter_type == 'lessThan':
+            conditions.append(col < value)
+        elif filter_type == 'greaterThanOrEqual':
+            conditions.append(col >= value)
         elif filter_type == 'lessThanOrEqual':
-            param_name = f"f{param_counter}"
-            conditions.append(f"{col_ref} <= :{param_name}")
-            params[param_name] = value
-            param_counter += 1
-
+            conditions.append(col <= value)
         elif filter_type == 'isNotNull':
-            conditions.append(f"{col_ref} IS NOT NULL")
-
+            conditions.append(col.is_not_null())
         elif filter_type == 'isNull':
-            conditions.append(f"{col_ref} IS NULL")
+            conditions.append(col.is_null())
 
-    return conditions, params
+    if not conditions:
+        return None
+    return pl.all_horizontal(conditions)
+
+
+def _has_case_collisions(df: pl.DataFrame, columns: List[str], dialect: SqlDialect) -> bool:
+    """
+    True when a text column holds values differing only by case ('abc' and
+    'ABC'): a case-insensitive source groups them together, Polars does not,
+    so the in-process pivot/drill must leave these to SQL.
+    """
+    if not dialect.text_ignores_case:
+        return False
+    for col in columns:
+        if df.schema.get(col) != pl.Utf8:
+            continue
+        values = df.get_column(col).drop_nulls().unique()
+        if values.str.to_lowercase().n_unique() != len(values):
+            return True
+    return False
+
+
+def _build_polars_metrics(metrics: List[Dict[str, Any]]) -> List[pl.Expr]:
+    """Polars equivalent of the metric SELECT parts built by execute_pivot"""
+    aggs = []
+    for m in metrics:
+        if m.get('type') == 'margin':
+            rev = pl.col(m.get('revenueField') or m.get('field') or 'Venduto').sum()
+            cost = pl.col(m.get('costField') or 'Costo').sum()
+            aggs.append(
+                pl.when(rev == 0).then(0.0)
+                .otherwise(((rev - cost) * 100.0 / rev).round(2))
+                .alias(m.get('name', 'MarginePerc'))
+            )
+            continue
+
+        agg = m.get('aggregation', 'SUM').upper()
+        field = m.get('field', '')
+        name = m.get('name', field)
+        if not field:
+            continue
+        if field == '*':
+            # Only COUNT(*) makes sense on every row
+            aggs.append(pl.len().alias(name))
+            continue
+
+        col = pl.col(field)
+        if agg == 'SUM':
+            aggs.append(col.sum().alias(name))
+        elif agg == 'AVG':
+            aggs.append(col.mean().alias(name))
+        elif agg == 'COUNT':
+            aggs.append(col.count().alias(name))
+        elif agg == 'MIN':
+            aggs.append(col.min().alias(name))
+        elif agg == 'MAX':
+            aggs.append(col.max().alias(name))
+        else:
+            raise ValueError(f"Unsupported aggregation for in-process pivot: {agg}")
+    return aggs
 
 
 class QueryEngine:
@@ -214,28 +825,20 @@ class QueryEngine:
         """
         Ensure connection pool is warmed before executing query.
         This eliminates cold start delays by pre-establishing connections.
-        Only warms once per unique connection per session.
+        Only warms once per engine: the flag lives on the (cached) Engine
+        itself, so the warm path is a single attribute lookup.
         """
-        pool_key = f"{conn_type}://{config['host']}:{config.get('port', 0)}/{config['database']}"
+        engine = get_engine(conn_type, config)
+        if getattr(engine, "_infobi_warmed", False):
+            return
 
-        if pool_key not in _warmed_connections:
-            logger.info(f"🔥 Pre-warming pool for first query: {pool_key}")
-            try:
-                engine = get_engine(conn_type, config)
-                with engine.connect() as conn:
-                    conn.execute(text("SELECT 1"))
-                _warmed_connections.add(pool_key)
-            except Exception as e:
-                logger.warning(f"Pool warm failed (will retry on query): {e}")
-
-    @staticmethod
-    def _execute_query_sync(db_type: str, config: dict, query: str) -> pa.Table:
-        """Synchronous query execution using SQLAlchemy Pool"""
-        engine = get_engine(db_type, config)
-        with engine.connect() as conn:
-            # Polars legge usando la connessione aperta del pool
-            df = pl.read_database(query, connection=conn)
-            return df.to_arrow()
+        logger.info("🔥 Pre-warming pool for first query: %s/%s", config['host'], config['database'])
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("SELECT 1"))
+            engine._infobi_warmed = True
+        except Exception as e:
+            logger.warning("Pool warm failed (will retry on query): %s", e)
 
     @staticmethod
     def _execute_df_sync(db_type: str, config: dict, query: str) -> pl.DataFrame:
@@ -254,27 +857,10 @@ class QueryEngine:
         """
         Execute parameterized query and return Polars DataFrame.
         Uses SQLAlchemy text() with bound parameters for SQL injection safety.
+        The rows are transposed once into Arrow and wrapped by Polars without
+        copying the column buffers.
         """
-        engine = get_engine(db_type, config)
-        with engine.connect() as conn:
-            if params:
-                # Use parameterized query
-                result = conn.execute(text(query), params)
-            else:
-                # No params, use regular execution
-                result = conn.execute(text(query))
-
-            # Convert to Polars DataFrame
-            rows = result.fetchall()
-            columns = list(result.keys())
-
-            if not rows:
-                # Return empty DataFrame with correct schema
-                return pl.DataFrame(schema={col: pl.Utf8 for col in columns})
-
-            # Build DataFrame from rows
-            data = {col: [row[i] for row in rows] for i, col in enumerate(columns)}
-            return pl.DataFrame(data)
+        return pl.from_arrow(QueryEngine._execute_arrow_with_params_sync(db_type, config, query, params))
 
     @staticmethod
     def _execute_arrow_with_params_sync(
@@ -290,9 +876,9 @@ class QueryEngine:
         engine = get_engine(db_type, config)
         with engine.connect() as conn:
             if params:
-                result = conn.execute(text(query), params)
+                result = conn.execute(_text(query), params)
             else:
-                result = conn.execute(text(query))
+                result = conn.execute(_text(query))
 
             rows = result.fetchall()
             columns = list(result.keys())
@@ -301,54 +887,238 @@ class QueryEngine:
                 # Return empty table
                 return pa.table({col: pa.array([], type=pa.string()) for col in columns})
 
-            # Build Arrow table from rows
-            data = {col: [row[i] for row in rows] for i, col in enumerate(columns)}
-            return pa.table(data)
+            # Transpose rows to columns in C (zip) instead of indexing every cell
+            return pa.table(dict(zip(columns, map(list, zip(*rows)))))
 
     @staticmethod
-    async def execute_query(
+    def _execute_scalar_sync(
         db_type: str,
         config: dict,
         query: str,
+        params: Dict[str, Any]
+    ) -> int:
+        """Execute a parameterized COUNT-style query and return its single value (0 if NULL)"""
+        engine = get_engine(db_type, config)
+        with engine.connect() as conn:
+            return int(conn.execute(_text(query), params).scalar() or 0)
+
+    @staticmethod
+    def _iter_record_batches_sync(
+        db_type: str,
+        config: dict,
+        query: str,
+        batch_rows: int = _IPC_BATCH_ROWS,
         limit: Optional[int] = None
-    ) -> tuple[bytes, int, float]:
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Run a query with a server-side cursor and yield it as Arrow record
+        batches of batch_rows rows: the full result is never held in memory.
+        The first batch fixes the stream schema (_stream_schema); every batch
+        is built against it (_conform_batch), so a later batch never changes
+        the types of a stream already sent.
+        With a limit, simple queries get the cap inlined (_inline_row_limit,
+        bound as :row_limit); the others are not wrapped but stop fetching
+        from the cursor once limit rows have been read.
+        """
+        params = {}
+        if limit:
+            limited = _inline_row_limit(query, get_dialect(db_type))
+            if limited:
+                query = limited
+                params = {"row_limit": int(limit)}
+
+        engine = get_engine(db_type, config)
+        with engine.connect().execution_options(stream_results=True) as conn:
+            result = conn.execute(_text(query), params)
+            columns = list(result.keys())
+            schema = None
+            remaining = int(limit) if limit else None
+
+            for rows in result.partitions(batch_rows):
+                if remaining is not None:
+                    rows = rows[:remaining]
+                    remaining -= len(rows)
+                    if not rows:
+                        break
+                data = dict(zip(columns, map(list, zip(*rows))))
+                if schema is None:
+                    schema = _stream_schema(data)
+                yield _conform_batch(data, schema)
+                if remaining == 0:
+                    break
+
+            if schema is None:
+                # No rows: schema-only stream
+                yield pa.RecordBatch.from_pydict(
+                    {col: pa.array([], type=pa.string()) for col in columns}
+                )
+
+    @staticmethod
+    async def execute_query_stream(
+        db_type: str,
+        config: dict,
+        query: str,
+        limit: Optional[int] = None
+    ) -> tuple[AsyncIterator[bytes], int, float]:
+        """
+        Execute query and return its result as a lazy iterator of IPC chunks.
+        The query and its first batch run up front (errors surface before the
+        response starts); the remaining batches are fetched from the cursor
+        while the response is sent, so peak memory is one batch, not the result.
+        The total row count is not known in advance: it is returned as -1.
+        Returns: (ipc_chunks, row_count, execution_time_ms)
+        """
         start = time.perf_counter()
-        
+
         try:
-            # Apply limit if specified
-            if limit:
-                if db_type == "mssql":
-                    query = f"SELECT TOP {limit} * FROM ({query}) AS subq"
-                else:
-                    query = f"SELECT * FROM ({query}) AS subq LIMIT {limit}"
-            
-            # Run blocking DB operation in thread pool
-            loop = asyncio.get_event_loop()
-            arrow_table = await loop.run_in_executor(
-                _executor,
-                QueryEngine._execute_query_sync,
-                db_type,
-                config,
-                query
-            )
-            
-            # Serialize to IPC
-            sink = BytesIO()
-            with ipc.new_stream(sink, arrow_table.schema) as writer:
-                writer.write_table(arrow_table)
-            
+            batches = QueryEngine._iter_record_batches_sync(db_type, config, query, limit=limit)
+            first = await _run_query(_next_chunk, db_type, config, batches)
+            if first is _END_OF_CHUNKS:
+                raise RuntimeError("Query returned no result batch")
+
             elapsed = (time.perf_counter() - start) * 1000
-            arrow_bytes = sink.getvalue()
-            
-            logger.info(f"Query executed: {arrow_table.num_rows} rows in {elapsed:.1f}ms")
-            
-            return arrow_bytes, arrow_table.num_rows, elapsed
-            
+            logger.info("Query started: first %d rows in %.1fms (streaming)", first.num_rows, elapsed)
+
+            def all_batches() -> Iterator[pa.RecordBatch]:
+                # yield from forwards close() to the cursor generator
+                yield first
+                yield from batches
+
+            chunks = _iter_ipc_batches(first.schema, all_batches())
+            return _prefetch_chunks(chunks, db_type, config), -1, elapsed
+
         except Exception as e:
             elapsed = (time.perf_counter() - start) * 1000
-            logger.error(f"Query error after {elapsed:.1f}ms: {e}")
+            logger.error("Query error after %.1fms: %s", elapsed, e)
             raise
-    
+
+    @staticmethod
+    def _aggregate_cached_sync(
+        db_type: str,
+        arrow_bytes: bytes,
+        group_by: List[str],
+        metrics: List[Dict[str, Any]],
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
+    ) -> Optional[tuple[bytes, int, float]]:
+        """
+        Run the execute_pivot aggregation in Polars over a cached IPC copy of
+        the report's base query, skipping the round-trip to the source DB.
+        Returns None when the grouping can't be reproduced for db_type
+        (_has_case_collisions).
+        Returns: (arrow_bytes, row_count, execution_time_ms)
+        """
+        start = time.perf_counter()
+        dialect = get_dialect(db_type)
+
+        df = pl.from_arrow(ipc.open_stream(arrow_bytes).read_all())
+        if _has_case_collisions(df, group_by, dialect):
+            return None
+        lf = df.lazy()
+
+        predicate = _build_polars_filter(filters, dialect)
+        if predicate is not None:
+            lf = lf.filter(predicate)
+
+        aggs = _build_polars_metrics(metrics)
+        if group_by and aggs:
+            lf = lf.group_by(group_by).agg(aggs).sort(group_by)
+        elif group_by:
+            lf = lf.select(group_by).unique().sort(group_by)
+        elif aggs:
+            lf = lf.select(aggs)
+
+        if limit:
+            lf = lf.head(int(limit))
+
+        arrow_table = lf.collect().to_arrow()
+        arrow_bytes = _to_ipc_bytes(arrow_table)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        logger.info("Pivot aggregated from cache: %d rows in %.1fms", arrow_table.num_rows, elapsed)
+        return arrow_bytes, arrow_table.num_rows, elapsed
+
+    @staticmethod
+    def _drill_cached_sync(
+        db_type: str,
+        arrow_bytes: bytes,
+        request: PivotDrillRequest
+    ) -> Optional[tuple[bytes, int, float]]:
+        """
+        Run a grouped execute_pivot_drill level in Polars over a cached IPC copy
+        of the report's base query: expanding nodes costs an in-memory group_by
+        instead of a GROUP BY round-trip per level.
+        Returns None for requests that are only handled in SQL (flat mode,
+        HAVING, group values differing only by case on a case-insensitive source).
+        """
+        current_level = len(request.groupKeys)
+        if not request.rowGroupCols or request.havingModel or current_level >= len(request.rowGroupCols):
+            return None
+
+        start = time.perf_counter()
+        group_col = request.rowGroupCols[current_level]
+        dialect = get_dialect(db_type)
+
+        df = pl.from_arrow(ipc.open_stream(arrow_bytes).read_all())
+        if _has_case_collisions(df, request.rowGroupCols[:current_level + 1], dialect):
+            return None
+        lf = df.lazy()
+
+        # Parent path + UI filters, same semantics as _build_drill_filter_clause
+        filters = {
+            col: {'type': f.type, 'value': f.filter} for col, f in request.filterModel.items()
+        }
+        predicate = _build_polars_filter(filters, dialect)
+        for col, key in zip(request.rowGroupCols, request.groupKeys):
+            cond = pl.col(col) == key
+            predicate = cond if predicate is None else predicate & cond
+        if predicate is not None:
+            lf = lf.filter(predicate)
+
+        aggs = []
+        for val_col in request.valueCols:
+            agg = val_col.aggFunc.upper()
+            col = pl.col(val_col.colId)
+            if agg == 'COUNT':
+                aggs.append(pl.len().alias(val_col.colId))
+            elif agg == 'SUM':
+                aggs.append(col.sum().alias(val_col.colId))
+            elif agg == 'AVG':
+                aggs.append(col.mean().alias(val_col.colId))
+            elif agg == 'MIN':
+                aggs.append(col.min().alias(val_col.colId))
+            elif agg == 'MAX':
+                aggs.append(col.max().alias(val_col.colId))
+            else:
+                return None
+
+        lf = (
+            lf.group_by([group_col, *request.pivotCols])
+            .agg(aggs)
+            .rename({group_col: 'key_val'})
+        )
+
+        # Only output columns are sortable; the group column is key_val
+        available_sort_cols = {'key_val', *request.pivotCols, *(v.colId for v in request.valueCols)}
+        sort_cols, descending = [], []
+        for sort in request.sortModel:
+            col = 'key_val' if sort.colId == group_col else sort.colId
+            if col in available_sort_cols:
+                sort_cols.append(col)
+                descending.append(sort.sort == "desc")
+        if not sort_cols:
+            sort_cols, descending = ['key_val'], [False]
+
+        offset_val = request.startRow or 0
+        limit_val = (request.endRow or 1000) - offset_val
+        grouped = lf.sort(sort_cols, descending=descending).collect()
+        arrow_table = grouped.slice(offset_val, limit_val).to_arrow()
+
+        elapsed = (time.perf_counter() - start) * 1000
+        logger.info("Pivot drill from cache: %d rows in %.1fms", arrow_table.num_rows, elapsed)
+        # Same contract as execute_pivot_drill: the count is the groups total
+        return _to_ipc_bytes(arrow_table), grouped.height, elapsed
+
     @staticmethod
     async def execute_pivot(
         db_type: str,
@@ -357,146 +1127,72 @@ class QueryEngine:
         group_by: List[str],
         metrics: List[Dict[str, Any]],
         filters: Optional[Dict[str, Any]] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        rollup: bool = False
     ) -> tuple[bytes, int, float]:
         """
-        Execute pivot query with ROLLUP for correct aggregations
+        Execute pivot query. By default a plain GROUP BY: only leaf groups are
+        computed (the grand total has its own endpoint). With rollup=True all
+        subtotal levels and the grand total come back from a single
+        GROUP BY ROLLUP scan, flagged by the __g_<col> columns (for exports
+        and dashboards that need every level at once).
         Returns: (arrow_bytes, row_count, execution_time_ms)
         """
-        start_total = time.perf_counter()
+        # One timer for every branch (the FLAT TABLE one included)
+        start = time.perf_counter()
         
         try:
-            is_mssql = db_type == "mssql"
+            dialect = get_dialect(db_type)
 
-            logger.info(f"🔍 execute_pivot called with groups={group_by}, metrics={len(metrics)}")
-            
-            # --- MEASURE SQL EXECUTION TIME ---
-            start_sql = time.perf_counter()
+            logger.debug("🔍 execute_pivot called with groups=%s, metrics=%d", group_by, len(metrics))
+
+            # Filters and row limit are bound as parameters: the SQL text only
+            # depends on the pivot shape, so the server can reuse its cached plan
+            where_sql, filter_params = _build_safe_filter_clause(filters, dialect)
 
             # CASE 1: No group_by and no metrics → FLAT TABLE (raw data with all columns)
             if not group_by and not metrics:
-                row_limit = limit if limit else 10000
-                limited_query = f"SELECT TOP {row_limit} * FROM ({base_query}) AS raw_data" if is_mssql else f"SELECT * FROM ({base_query}) AS raw_data LIMIT {row_limit}"
+                params = {**filter_params, "row_limit": int(limit) if limit else 10000}
+                limited = None if where_sql else _inline_row_limit(base_query, dialect)
+                if limited:
+                    limited_query = limited
+                elif dialect.is_mssql:
+                    limited_query = f"SELECT TOP (:row_limit) * FROM ({base_query}) AS raw_data {where_sql}"
+                else:
+                    limited_query = f"SELECT * FROM ({base_query}) AS raw_data {where_sql} LIMIT :row_limit"
 
-                loop = asyncio.get_event_loop()
-                arrow_table = await loop.run_in_executor(
-                    _executor,
-                    QueryEngine._execute_query_sync,
+                arrow_table = await _run_query(
+                    QueryEngine._execute_arrow_with_params_sync,
                     db_type,
                     config,
-                    limited_query
+                    limited_query,
+                    params
                 )
-            
-
 
-                sink = BytesIO()
-                with ipc.new_stream(sink, arrow_table.schema) as writer:
-                    writer.write_table(arrow_table)
+                arrow_bytes = await _to_ipc_bytes_async(arrow_table)
 
                 elapsed = (time.perf_counter() - start) * 1000
-                logger.info(f"📊 FLAT TABLE mode: {arrow_table.num_rows} rows, {len(arrow_table.schema)} columns ({elapsed:.1f}ms)")
-                return sink.getvalue(), arrow_table.num_rows, elapsed
-
-            # Build SELECT clause
-            start_build = time.perf_counter()
-            select_parts = []
-            
-            # Group by columns
-            for col in group_by:
-                select_parts.append(f'[{col}]' if is_mssql else f'"{col}"')
-            
-            # Metrics with aggregations
-            for m in metrics:
-                if m.get('type') == 'margin':
-                    # Margin formula: (revenue - cost) / revenue * 100
-                    rev = m.get('revenueField', m.get('field', 'Venduto'))
-                    cost = m.get('costField', 'Costo')
-                    col_name = m.get('name', 'MarginePerc')
-                    if is_mssql:
-                        select_parts.append(f'''
-                            CASE 
-                                WHEN SUM([{rev}]) = 0 THEN 0 
-                                ELSE ROUND(CAST((SUM([{rev}]) - SUM([{cost}])) * 100.0 / SUM([{rev}]) AS DECIMAL(10,2)), 2)
-                            END AS [{col_name}]
-                        ''')
-                    else:
-                        select_parts.append(f'''
-                            CASE 
-                                WHEN SUM("{rev}") = 0 THEN 0 
-                                ELSE ROUND(CAST((SUM("{rev}") - SUM("{cost}")) * 100.0 / SUM("{rev}") AS DECIMAL(10,2)), 2)
-                            END AS "{col_name}"
-                        ''')
-                else:
-                    agg = m.get('aggregation', 'SUM').upper()
-                    field = m.get('field', '')
-                    name = m.get('name', field)
-                    if field:
-                        # FIX: Handle COUNT(*) correctly without quoting *
-                        if field == '*':
-                            select_parts.append(f'{agg}(*) AS [{name}]' if is_mssql else f'{agg}(*) AS "{name}"')
-                        elif is_mssql:
-                            select_parts.append(f'{agg}([{field}]) AS [{name}]')
-                        else:
-                            select_parts.append(f'{agg}("{field}") AS "{name}"')
-            
-            # If no select parts, select all
-            if not select_parts:
-                select_parts = ['*']
-            
-            # Build GROUP BY with ROLLUP for initial flat loading 
-            # (Note: This old execute_pivot might be deprecated by execute_pivot_drill later)
-            if group_by:
-                if is_mssql:
-                    group_clause = ', '.join(f'[{col}]' for col in group_by)
-                    # Use standard grouping for now to avoid complexity of handling rollup structure in UI
-                    # unless standard grouping is requested.
-                    group_by_sql = f"GROUP BY {group_clause}" 
-                    order_by_sql = f"ORDER BY {group_clause}"
-                else:
-                    group_clause = ', '.join(f'"{col}"' for col in group_by)
-                    group_by_sql = f"GROUP BY {group_clause}"
-                    order_by_sql = f"ORDER BY {group_clause}"
-            else:
-                group_by_sql = ""
-                order_by_sql = ""
-            
-            # Build WHERE clause from filters (using parameterized queries for safety)
-            where_sql, filter_params = _build_safe_filter_clause(filters, is_mssql)
+                logger.info("📊 FLAT TABLE mode: %d rows, %d columns (%.1fms)", arrow_table.num_rows, len(arrow_table.schema), elapsed)
+                return arrow_bytes, arrow_table.num_rows, elapsed
 
-            # Build LIMIT clause for preview mode
             if limit:
-                if is_mssql:
-                    sql = f"""
-                        SELECT TOP {int(limit)} {', '.join(select_parts)}
-                        FROM ({base_query}) AS base_data
-                        {where_sql}
-                        {group_by_sql}
-                        {order_by_sql}
-                    """
-                else:
-                    sql = f"""
-                        SELECT {', '.join(select_parts)}
-                        FROM ({base_query}) AS base_data
-                        {where_sql}
-                        {group_by_sql}
-                        {order_by_sql}
-                        LIMIT {int(limit)}
-                    """
-            else:
-                sql = f"""
-                    SELECT {', '.join(select_parts)}
-                    FROM ({base_query}) AS base_data
-                    {where_sql}
-                    {group_by_sql}
-                    {order_by_sql}
-                """
+                filter_params = {**filter_params, "row_limit": int(limit)}
+
+            # Everything but the base query is cached per pivot shape
+            prefix, suffix = _build_pivot_sql(
+                dialect,
+                tuple(group_by),
+                tuple(tuple(m.items()) for m in metrics),
+                where_sql,
+                bool(limit),
+                rollup and bool(group_by)
+            )
+            sql = prefix + base_query + suffix
 
-            logger.info(f"Pivot SQL: {sql[:500]}...")
+            logger.debug("Pivot SQL: %.500s...", sql)
 
             # Execute with parameterized query for SQL injection safety
-            loop = asyncio.get_event_loop()
-            arrow_table = await loop.run_in_executor(
-                _executor,
+            arrow_table = await _run_query(
                 QueryEngine._execute_arrow_with_params_sync,
                 db_type,
                 config,
@@ -505,19 +1201,16 @@ class QueryEngine:
             )
             
             # Serialize to IPC
-            sink = BytesIO()
-            with ipc.new_stream(sink, arrow_table.schema) as writer:
-                writer.write_table(arrow_table)
+            arrow_bytes = await _to_ipc_bytes_async(arrow_table)
 
-            elapsed = (time.perf_counter() - start_total) * 1000
-            arrow_bytes = sink.getvalue()
+            elapsed = (time.perf_counter() - start) * 1000
 
-            logger.info(f"Pivot executed: {arrow_table.num_rows} rows in {elapsed:.1f}ms")
+            logger.info("Pivot executed: %d rows in %.1fms", arrow_table.num_rows, elapsed)
             
             return arrow_bytes, arrow_table.num_rows, elapsed
             
         except Exception as e:
-            logger.error(f"Pivot error: {e}")
+            logger.error("Pivot error: %s", e)
             raise
     
     @staticmethod
@@ -526,99 +1219,80 @@ class QueryEngine:
         config: dict,
         base_query: str,
         request: GridRequest
-    ) -> tuple[List[Dict[str, Any]], int, float]:
+    ) -> tuple[memoryview, int, float]:
         """
         Execute query with server-side pagination, sorting, and filtering.
-        Returns: (rows, total_count, execution_time_ms)
+        Returns: (arrow_ipc, total_count, execution_time_ms)
         """
         start = time.perf_counter()
         
         try:
-            # 1. Build WHERE clause (Basic implementation - requires sanitization in prod)
-            where_clauses = []
-            
-            for col, filter_def in request.filterModel.items():
-                # Basic sanitization for col name to prevent obvious injection
-                clean_col = "".join(c for c in col if c.isalnum() or c in '_')
-                
-                val = filter_def.filter
-                if isinstance(val, str):
-                    val = val.replace("'", "''") # Escape single quotes
-                    
-                if filter_def.type == 'contains':
-                    where_clauses.append(f"{clean_col} LIKE '%{val}%'")
-                elif filter_def.type == 'equals':
-                    if isinstance(val, str):
-                        where_clauses.append(f"{clean_col} = '{val}'")
-                    else:
-                        where_clauses.append(f"{clean_col} = {val}")
-                elif filter_def.type == 'startsWith':
-                    where_clauses.append(f"{clean_col} LIKE '{val}%'")
-                elif filter_def.type == 'notEqual':
-                    if isinstance(val, str): where_clauses.append(f"{clean_col} != '{val}'")
-                    else: where_clauses.append(f"{clean_col} != {val}")
-                elif filter_def.type == 'greaterThan':
-                    where_clauses.append(f"{clean_col} > {val}")
-                elif filter_def.type == 'greaterThanOrEqual':
-                    where_clauses.append(f"{clean_col} >= {val}")
-                elif filter_def.type == 'lessThan':
-                    where_clauses.append(f"{clean_col} < {val}")
-                elif filter_def.type == 'lessThanOrEqual':
-                    where_clauses.append(f"{clean_col} <= {val}")
-                elif filter_def.type == 'isNotNull':
-                    where_clauses.append(f"{clean_col} IS NOT NULL")
-                elif filter_def.type == 'isNull':
-                    where_clauses.append(f"{clean_col} IS NULL")
-            
-            where_sql = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-            
-            # 2. Build ORDER BY
-            order_clauses = []
-            for sort in request.sortModel:
-                clean_col = "".join(c for c in sort.colId if c.isalnum() or c in '_')
-                direction = "DESC" if sort.sort == "desc" else "ASC"
-                order_clauses.append(f"{clean_col} {direction}")
-            
-            order_sql = " ORDER BY " + ", ".join(order_clauses) if order_clauses else ""
+            # 1. Build WHERE clause with bound parameters (same builder as the drill-down)
+            dialect = get_dialect(db_type)
+            where_conditions, filter_params = _build_drill_filter_clause(
+                request.filterModel, [], [], dialect
+            )
+            where_sql = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
             
-            # 3. Construct SQL
-            is_mssql = db_type == "mssql"
+            # 2. Build ORDER BY (sanitized, quoted like the filter columns)
+            order_sql = _order_by_sql(request.sortModel, dialect)
+
+            # 3. Construct SQL (offset/limit bound: scrolling reuses one plan)
             limit = request.endRow - request.startRow
             offset = request.startRow
+            page_params = {"row_offset": int(offset), "row_limit": int(limit)}
             
             # Wrap base query to treat it as a table
-            wrapped_base = f"SELECT * FROM ({base_query}) AS base"
-            full_sql_structure = f"{wrapped_base} {where_sql}"
-            
-            # Get Total Count
-            count_query = f"SELECT COUNT(*) as total FROM ({full_sql_structure}) AS count_tbl"
-            
-            engine = get_engine(db_type, config)
-            with engine.connect() as conn:
-                count_df = pl.read_database(count_query, connection=conn)
-                total_rows = int(count_df['total'][0]) if not count_df.is_empty() else 0
-            
-            # Fetch Page
-            if is_mssql:
-                if not order_sql:
-                     order_sql = "ORDER BY (SELECT NULL)"
-                data_query = f"{full_sql_structure} {order_sql} OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY"
+            full_sql_structure = f"SELECT * FROM ({base_query}) AS base {where_sql}"
+            # Filters applied directly on the derived table, one nesting level less
+            count_query = f"SELECT COUNT(*) AS total FROM ({base_query}) AS base {where_sql}"
+
+            def paged(sql: str) -> str:
+                return f"{sql} {order_sql} {_page_sql(dialect)}"
+
+            inline_page = None
+            if not where_sql and not order_sql and offset == 0:
+                # First unsorted page of a simple query: cap the scan itself
+                inline_page = _inline_row_limit(base_query, dialect)
+
+            if where_sql:
+                # Filtered: the total comes from a window COUNT on the same
+                # scan, so page and count are one round trip
+                counted_sql = f"SELECT base.*, COUNT(*) OVER () AS __total FROM ({base_query}) AS base {where_sql}"
+                data_table = await _run_query(QueryEngine._execute_arrow_with_params_sync, db_type, config, paged(counted_sql), {**filter_params, **page_params})
+
+                if data_table.num_rows:
+                    total_rows = int(data_table.column('__total')[0].as_py())
+                elif offset > 0:
+                    # Page past the end: no row carries the total, count separately
+                    total_rows = await _run_query(QueryEngine._execute_scalar_sync, db_type, config, count_query, filter_params)
+                else:
+                    total_rows = 0
+                if '__total' in data_table.column_names:
+                    data_table = data_table.drop_columns(['__total'])
             else:
-                data_query = f"{full_sql_structure} {order_sql} LIMIT {limit} OFFSET {offset}"
-            
-            # Execute
-            with engine.connect() as conn:
-                data_df = pl.read_database(data_query, connection=conn)
-            
-            rows = data_df.to_dicts()
+                # Unfiltered: a window COUNT would make the DB scan the whole
+                # source before returning the first page, so run a plain
+                # COUNT and the page fetch concurrently on two pooled connections
+                total_rows, data_table = await asyncio.gather(
+                    _run_query(QueryEngine._execute_scalar_sync, db_type, config, count_query, {}),
+                    _run_query(
+                        QueryEngine._execute_arrow_with_params_sync, db_type, config,
+                        inline_page or paged(full_sql_structure),
+                        {"row_limit": int(limit)} if inline_page else page_params
+                    )
+                )
+
+            # Columnar IPC instead of one Python dict per row
+            arrow_bytes = await _to_ipc_bytes_async(data_table)
             
             elapsed = (time.perf_counter() - start) * 1000
-            logger.info(f"Grid query: {len(rows)}/{total_rows} rows in {elapsed:.1f}ms")
+            logger.info("Grid query: %d/%d rows in %.1fms", data_table.num_rows, total_rows, elapsed)
             
-            return rows, total_rows, elapsed
+            return arrow_bytes, total_rows, elapsed
             
         except Exception as e:
-            logger.error(f"Grid query error: {e}")
+            logger.error("Grid query error: %s", e)
             raise
 
     @staticmethod
@@ -627,10 +1301,11 @@ class QueryEngine:
         config: dict,
         base_query: str,
         request: PivotDrillRequest
-    ) -> tuple[List[Dict[str, Any]], int, float]:
+    ) -> tuple[memoryview, int, float]:
         """
         Executes a Drill-Down query for Lazy Loading.
         Calculates aggregations for the specific node requested.
+        Returns: (arrow_ipc, row_count, execution_time_ms)
         """
         start = time.perf_counter()
         try:
@@ -639,7 +1314,7 @@ class QueryEngine:
             
             # Special Case: No Groups Defined -> Return Flat Paginated Data
             if len(request.rowGroupCols) == 0:
-                 is_mssql = db_type == "mssql"
+                 dialect = get_dialect(db_type)
                  
                  # Determine columns to select
                  select_parts = []
@@ -648,8 +1323,7 @@ class QueryEngine:
                  # 1. Add Pivot/Split columns first (so they appear on left)
                  for p_col in request.pivotCols:
                      if p_col not in added_cols:
-                        if is_mssql: select_parts.append(f"[{p_col}]")
-                        else: select_parts.append(f'"{p_col}"')
+                        select_parts.append(dialect.quote(p_col))
                         added_cols.add(p_col)
 
                  # 2. Add Value/Metric columns
@@ -658,8 +1332,7 @@ class QueryEngine:
                     # We strip aggregation if present, or just use the colId
                     col_id = val_col.colId
                     if col_id not in added_cols:
-                        if is_mssql: select_parts.append(f"[{col_id}]")
-                        else: select_parts.append(f'"{col_id}"')
+                        select_parts.append(dialect.quote(col_id))
                         added_cols.add(col_id)
                  
                  if not select_parts:
@@ -669,249 +1342,119 @@ class QueryEngine:
 
                  # Apply filters using parameterized queries (SQL injection safe)
                  filter_conditions, filter_params = _build_drill_filter_clause(
-                     request.filterModel, [], [], is_mssql
+                     request.filterModel, [], [], dialect
                  )
 
                  if filter_conditions:
                      base_select += " WHERE " + " AND ".join(filter_conditions)
 
-                 # Apply Sorting (column names are sanitized)
-                 order_sql = ""
-                 if request.sortModel:
-                    order_clauses = []
-                    for sort in request.sortModel:
-                        clean_col = _sanitize_column_name(sort.colId)
-                        direction = "DESC" if sort.sort == "desc" else "ASC"
-                        order_clauses.append(f"{clean_col} {direction}")
-                    order_sql = " ORDER BY " + ", ".join(order_clauses)
-
-                 # Apply Pagination
+                 # Apply Sorting and Pagination (shared with the grid, bound)
                  start_row = int(request.startRow or 0)
                  end_row = int(request.endRow or 100)
-                 limit = end_row - start_row
-
-                 if is_mssql:
-                     if not order_sql:
-                         order_sql = "ORDER BY (SELECT NULL)"
-                     full_query = f"{base_select} {order_sql} OFFSET {start_row} ROWS FETCH NEXT {limit} ROWS ONLY"
-                 else:
-                     full_query = f"{base_select} {order_sql} LIMIT {limit} OFFSET {start_row}"
+                 filter_params["row_offset"] = start_row
+                 filter_params["row_limit"] = end_row - start_row
+                 full_query = f"{base_select} {_order_by_sql(request.sortModel, dialect)} {_page_sql(dialect)}"
 
                  # Execute with parameterized query
-                 engine = get_engine(db_type, config)
-                 with engine.connect() as conn:
-                     if filter_params:
-                         result = conn.execute(text(full_query), filter_params)
-                         rows_data = result.fetchall()
-                         columns = list(result.keys())
-                         if rows_data:
-                             data = {col: [row[i] for row in rows_data] for i, col in enumerate(columns)}
-                             data_df = pl.DataFrame(data)
-                         else:
-                             data_df = pl.DataFrame()
-                     else:
-                         data_df = pl.read_database(full_query, connection=conn)
-
-                 rows = data_df.to_dicts()
+                 arrow_table = await _run_query(
+                     QueryEngine._execute_arrow_with_params_sync,
+                     db_type, config, full_query, filter_params
+                 )
+
                  elapsed = (time.perf_counter() - start) * 1000
-                 return rows, len(rows), elapsed
+                 return await _to_ipc_bytes_async(arrow_table), arrow_table.num_rows, elapsed
 
             # If we digged deeper than defined groups, return empty (shouldn't happen in logic)
             if current_level >= len(request.rowGroupCols):
-                 return [], 0, 0
+                 return _to_ipc_bytes(pa.table({})), 0, 0
             
             group_col = request.rowGroupCols[current_level] # The column to group by NOW
-            is_mssql_where = db_type == "mssql"
+            dialect = get_dialect(db_type)
 
             # 2. Build WHERE clauses using parameterized queries (SQL injection safe)
             where_conditions, filter_params = _build_drill_filter_clause(
                 request.filterModel,
                 request.groupKeys,
                 request.rowGroupCols,
-                is_mssql_where
+                dialect
             )
 
             where_sql = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
             
-            # 3. Build Select & Aggregations
-            select_parts = [f"{group_col} as key_val"] # Key column used for tree structure
-            group_by_parts = [group_col]
-            
-            # Support for Split By (Pivot Columns)
-            # If pivotCols are present, we must include them in SELECT and GROUP BY
-            for pivot_col in request.pivotCols:
-                select_parts.append(f"{pivot_col} as {pivot_col}")
-                group_by_parts.append(pivot_col)
-
-            for val_col in request.valueCols:
-                col_id = val_col.colId
-                agg = val_col.aggFunc.upper()
-                if agg == 'COUNT':
-                     select_parts.append(f"COUNT(*) as {col_id}")
-                else:
-                    # Basic SUM, AVG, MIN, MAX
-                    select_parts.append(f"{agg}({col_id}) as {col_id}")
-            
-            select_sql = ", ".join(select_parts)
-            group_by_sql = ", ".join(group_by_parts)
-            
-            # 4. Construct SQL with Pagination for Groups (Drill-Down)
-            # This prevents crashing when a group has thousands of children
-            
-            # Default pagination if not provided (safety net)
-            limit_val = (request.endRow or 1000) - (request.startRow or 0)
-            offset_val = request.startRow or 0
-            
-            # Build ORDER BY
-            # Note: The group column is aliased as 'key_val' in the inner query,
-            # so we need to map it correctly in the ORDER BY clause.
-            # Also, we can only sort by columns that exist in the output:
-            # - group_col (aliased as key_val)
-            # - pivot columns
-            # - aggregated value columns
-            # IMPORTANT: Only include rowGroupCols UP TO current level (not deeper levels!)
-            # e.g., if rowGroupCols=['agente','fornitore'] and current_level=0,
-            # only 'agente' (the current group_col) is in the output, NOT 'fornitore'
-            available_sort_cols = {group_col, 'key_val'}
-            # Only add group cols that are ABOVE current level (already filtered in WHERE)
-            # The current group_col is already added above
-            available_sort_cols.update(request.pivotCols)
-            available_sort_cols.update(v.colId for v in request.valueCols)
-
-            order_sql = ""
-            if request.sortModel:
-                order_clauses = []
-                for sort in request.sortModel:
-                    # Security: sanitize column id
-                    clean_col = "".join(c for c in sort.colId if c.isalnum() or c in '_')
-                    direction = "DESC" if sort.sort == "desc" else "ASC"
-
-                    # Skip columns that don't exist in the grouped output
-                    if clean_col not in available_sort_cols:
-                        logger.debug(f"Skipping sort column '{clean_col}' - not in grouped output")
-                        continue
-
-                    # Map group column to its alias 'key_val'
-                    if clean_col == group_col:
-                        clean_col = "key_val"
-                    order_clauses.append(f"{clean_col} {direction}")
-
-                if order_clauses:
-                    order_sql = "ORDER BY " + ", ".join(order_clauses)
-                else:
-                    # Fallback if all sort columns were invalid
-                    order_sql = "ORDER BY key_val ASC"
-            else:
-                # Default Sort by key
-                order_sql = "ORDER BY key_val ASC"
-
-            is_mssql_drill = db_type == "mssql"
-
-            # Build HAVING clause from havingModel
+            # 3. Build HAVING clause from havingModel
             having_sql = ""
             if request.havingModel:
                 having_conditions = []
-                for h in request.havingModel:
-                    clean_field = "".join(c for c in h.field if c.isalnum() or c in '_')
+                for i, h in enumerate(request.havingModel):
                     agg = h.aggregation.upper()
-                    val = h.value
+                    op = _HAVING_OPS.get(h.type)
+                    if agg not in ALLOWED_AGGREGATIONS:
+                        raise ValueError(f"Unsupported aggregation: {h.aggregation}")
+                    if op is None:
+                        raise ValueError(f"Unsupported having type: {h.type}")
+                    if h.value is None:
+                        continue
 
-                    # Build aggregation expression
+                    # Build aggregation expression (field sanitized and quoted)
                     if agg == 'COUNT':
-                        agg_expr = f"COUNT(*)"
+                        agg_expr = "COUNT(*)"
                     else:
-                        agg_expr = f"{agg}({clean_field})"
-
-                    # Build comparison
-                    if h.type == 'greaterThan':
-                        having_conditions.append(f"{agg_expr} > {val}")
-                    elif h.type == 'greaterThanOrEqual':
-                        having_conditions.append(f"{agg_expr} >= {val}")
-                    elif h.type == 'lessThan':
-                        having_conditions.append(f"{agg_expr} < {val}")
-                    elif h.type == 'lessThanOrEqual':
-                        having_conditions.append(f"{agg_expr} <= {val}")
-                    elif h.type == 'equals':
-                        having_conditions.append(f"{agg_expr} = {val}")
-                    elif h.type == 'notEqual':
-                        having_conditions.append(f"{agg_expr} != {val}")
+                        agg_expr = f"{agg}({dialect.quote(_sanitize_column_name(h.field))})"
+
+                    # Threshold bound as :hv_i, so the SQL text (and the DB
+                    # plan) does not change with the value
+                    having_conditions.append(f"{agg_expr} {op} :hv_{i}")
+                    filter_params[f"hv_{i}"] = h.value
 
                 if having_conditions:
                     having_sql = "HAVING " + " AND ".join(having_conditions)
 
-            # WRAP QUERY to ensure aliases are valid in ORDER BY and Pagination
-            inner_query = f"""
-                SELECT {select_sql}
-                FROM ({base_query}) AS base
-                {where_sql}
-                GROUP BY {group_by_sql}
-                {having_sql}
-            """
-            
-            if is_mssql_drill:
-                 # MSSQL requires Order By for offset
-                 # We reference the columns from the inner query (aliases)
-                 full_query = f"""
-                    SELECT * FROM ({inner_query}) AS drill_tbl
-                    {order_sql}
-                    OFFSET {offset_val} ROWS FETCH NEXT {limit_val} ROWS ONLY
-                 """
-            else:
-                 full_query = f"""
-                    SELECT * FROM ({inner_query}) AS drill_tbl
-                    {order_sql}
-                    LIMIT {limit_val} OFFSET {offset_val}
-                 """
+            # 4. SQL with Pagination for Groups (Drill-Down), cached per request
+            # shape: AG Grid scrolling only changes the bound offset/limit
+            # This prevents crashing when a group has thousands of children
+            prefix, suffix = _build_drill_sql(
+                dialect,
+                group_col,
+                tuple(request.pivotCols),
+                tuple((v.colId, v.aggFunc.upper()) for v in request.valueCols),
+                tuple((s.colId, s.sort == "desc") for s in request.sortModel),
+                where_sql,
+                having_sql
+            )
+            full_query = prefix + base_query + suffix
+
+            # Default pagination if not provided (safety net)
+            offset_val = request.startRow or 0
+            filter_params["row_offset"] = int(offset_val)
+            filter_params["row_limit"] = int((request.endRow or 1000) - offset_val)
 
             # Execute with parameterized query
-            engine = get_engine(db_type, config)
-            with engine.connect() as conn:
-                if filter_params:
-                    result = conn.execute(text(full_query), filter_params)
-                    rows_data = result.fetchall()
-                    columns = list(result.keys())
-                    if rows_data:
-                        data = {col: [row[i] for row in rows_data] for i, col in enumerate(columns)}
-                        data_df = pl.DataFrame(data)
-                    else:
-                        data_df = pl.DataFrame()
-                else:
-                    data_df = pl.read_database(full_query, connection=conn)
-            rows = data_df.to_dicts()
-            
+            arrow_table = await _run_query(
+                QueryEngine._execute_arrow_with_params_sync,
+                db_type, config, full_query, filter_params
+            )
+
+            # Total groups of this level (X-Total-Count), from the window COUNT
+            total_rows = arrow_table.num_rows
+            if '__total' in arrow_table.column_names:
+                if arrow_table.num_rows:
+                    total_rows = int(arrow_table.column('__total')[0].as_py())
+                arrow_table = arrow_table.drop_columns(['__total'])
+
             elapsed = (time.perf_counter() - start) * 1000
-            return rows, len(rows), elapsed
+            return await _to_ipc_bytes_async(arrow_table), total_rows, elapsed
             
         except Exception as e:
-            logger.error(f"Pivot drill error: {e}")
+            logger.error("Pivot drill error: %s", e)
             raise
 
-    @staticmethod
-    async def get_column_values(db_type: str, config: dict, base_query: str, column: str) -> List[Any]:
-        """Fetch distinct sorted values for a column (used for Pivot Headers)"""
-        try:
-             # Sanitization
-             clean_col = "".join(c for c in column if c.isalnum() or c in '_')
-             
-             query = f"SELECT DISTINCT {clean_col} FROM ({base_query}) AS base ORDER BY {clean_col}"
-             engine = get_engine(db_type, config)
-             with engine.connect() as conn:
-                 df = pl.read_database(query, connection=conn)
-             
-             # Handle potential None/Null values
-             values = df[clean_col].to_list()
-             return [v for v in values if v is not None]
-             
-        except Exception as e:
-            logger.error(f"Get values error: {e}")
-            return []
-
     @staticmethod
     def hash_config(config: dict) -> str:
         """Create hash of pivot configuration for caching"""
-        import json
-        content = json.dumps(config, sort_keys=True)
-        return hashlib.md5(content.encode()).hexdigest()[:16]
+        # orjson returns bytes directly; blake2b with an 8-byte digest gives
+        # the same 16 hex chars as before without going through MD5
+        content = orjson.dumps(config, option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(content, digest_size=8).hexdigest()
 
 # Singleton
 query_engine = QueryEngine()
@@ -0,0 +1,19 @@
+"""HTTP response for Arrow IPC payloads"""
+from typing import Any, Union
+from fastapi import Response
+
+
+class ArrowResponse(Response):
+    """
+    Response for Arrow IPC stream payloads.
+
+    Accepts any buffer-protocol object (bytes, or a memoryview over a
+    pa.Buffer) and sends it as-is: Starlette's Response only takes bytes/str,
+    which would force a full copy of the IPC buffer into a bytes object.
+    """
+    media_type = "application/vnd.apache.arrow.stream"
+
+    def render(self, content: Any) -> Union[bytes, memoryview]:
+        if isinstance(content, bytes):
+            return content
+        return memoryview(content)
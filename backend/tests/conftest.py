@@ -0,0 +1,40 @@
+"""
+Shared fixtures: an in-memory SQLite engine standing in for the pooled
+source-database engines (get_engine is stubbed).
+"""
+from functools import partial
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.services import query_engine
+from app.services.query_engine import QueryEngine
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sales (id INTEGER, agent TEXT, amount REAL)"))
+        conn.execute(
+            text("INSERT INTO sales VALUES (:id, :agent, :amount)"),
+            [
+                {"id": i, "agent": None if i < 4 else f"Agent{i % 3}", "amount": i * 1.5}
+                for i in range(10)
+            ],
+        )
+    monkeypatch.setattr(query_engine, "get_engine", lambda db_type, config: engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    """Stream in batches of 3 rows, so a 10-row result spans several batches"""
+    iter_batches = QueryEngine.__dict__["_iter_record_batches_sync"].__func__
+    monkeypatch.setattr(
+        QueryEngine, "_iter_record_batches_sync", staticmethod(partial(iter_batches, batch_rows=3))
+    )
@@ -0,0 +1,156 @@
+"""
+CacheService: the in-process TTL/LRU layer in front of Redis, over an
+in-memory stand-in for the Redis client.
+"""
+import asyncio
+from fnmatch import fnmatchcase
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import CacheService
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.reads = 0
+
+    async def get(self, key):
+        self.reads += 1
+        return self.data.get(key)
+
+    async def mget(self, *keys):
+        self.reads += 1
+        return [self.data.get(k) for k in keys]
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+
+    async def keys(self, pattern):
+        return [k for k in self.data if fnmatchcase(k, pattern)]
+
+    async def delete(self, *keys):
+        for k in keys:
+            self.data.pop(k, None)
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.ops.append((key, ttl, value))
+
+    async def execute(self):
+        for op in self.ops:
+            await self.redis.setex(*op)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the cache module sees the fake clock, not the event loop
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def service(clock, monkeypatch):
+    monkeypatch.setattr(cache_module.settings, "CACHE_LOCAL_TTL", 10)
+    monkeypatch.setattr(cache_module.settings, "CACHE_LOCAL_MAX_ITEMS", 3)
+    monkeypatch.setattr(cache_module.settings, "CACHE_LOCAL_MAX_BYTES", 100)
+    service = CacheService()
+    service.redis = FakeRedis()
+    return service
+
+
+def test_local_hit_skips_redis(service):
+    async def run():
+        await service.set_pivot(1, "a", b"ipc", 7)
+        return await service.get_pivot(1, "a")
+
+    assert asyncio.run(run()) == (b"ipc", 7)
+    assert service.redis.reads == 0
+
+
+def test_local_entry_expires_after_ttl(service, clock):
+    async def run():
+        await service.set_pivot(1, "a", b"ipc", 7)
+        clock.now += 11
+        return await service.get_pivot(1, "a")
+
+    # Expired locally: served (and re-cached locally) from Redis
+    assert asyncio.run(run()) == (b"ipc", 7)
+    assert service.redis.reads == 1
+    assert len(service._local) == 1
+
+
+def test_local_ttl_never_exceeds_entry_ttl(service, clock):
+    async def run():
+        await service.set_pivot(1, "a", b"ipc", 7, ttl=2)
+        clock.now += 3
+        return service._local_get(service.report_key("pivot", 1, "a"))
+
+    assert asyncio.run(run()) is None
+
+
+def test_lru_evicts_by_item_count(service):
+    for name in "abc":
+        service._local_set(name, b"x", -1)
+    service._local_get("a")  # a becomes most recently used
+    service._local_set("d", b"x", -1)
+    assert list(service._local) == ["c", "a", "d"]
+    assert service._local_bytes == 3
+
+
+def test_lru_evicts_by_total_bytes(service):
+    service._local_set("a", b"x" * 60, -1)
+    service._local_set("b", b"x" * 30, -1)
+    service._local_set("c", b"x" * 30, -1)
+    assert list(service._local) == ["b", "c"]
+    assert service._local_bytes == 60
+    # Larger than the whole budget: never kept locally
+    service._local_set("big", b"x" * 101, -1)
+    assert "big" not in service._local
+
+
+def test_overwrite_keeps_byte_count(service):
+    service._local_set("a", b"x" * 10, -1)
+    service._local_set("a", b"x" * 20, -1)
+    assert service._local_bytes == 20
+
+
+def test_invalidate_report_drops_only_that_report(service):
+    async def run():
+        await service.set_pivot(5, "a", b"p5", 1)
+        await service.set_query(5, "q", b"q5")
+        await service.set_pivot(15, "a", b"p15", 1)
+        await service.set_query(51, "q", b"q51")
+        await service.invalidate_report(5)
+
+    asyncio.run(run())
+    assert sorted(service._local) == ["infobi:pivot:15:a", "infobi:query:51:q"]
+    assert sorted(service.redis.data) == [
+        "infobi:pivot:15:a", "infobi:pivot:15:a:rows", "infobi:query:51:q"
+    ]
+    assert service._local_bytes == len(b"p15") + len(b"q51")
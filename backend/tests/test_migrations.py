@@ -0,0 +1,103 @@
+"""
+run_migrations against a legacy SQLite users table (in-memory, aiosqlite).
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db import migrations
+
+
+def _run(*steps):
+    """Run each step(session) on its own session over one in-memory database"""
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT)"
+            ))
+            await conn.execute(text(
+                "INSERT INTO users (username) VALUES ('infostudio'), ('mario')"
+            ))
+        results = []
+        for step in steps:
+            async with AsyncSession(engine) as session:
+                results.append(await step(session))
+        await engine.dispose()
+        return results
+
+    return asyncio.run(run())
+
+
+async def _versions(session):
+    rows = await session.execute(text("SELECT version FROM schema_migrations ORDER BY version"))
+    return [row[0] for row in rows]
+
+
+async def _system_accounts(session):
+    rows = await session.execute(text(
+        "SELECT username FROM users WHERE is_system_account = 1 ORDER BY username"
+    ))
+    return [row[0] for row in rows]
+
+
+def test_pending_migrations_run_and_are_recorded():
+    _, versions, accounts = _run(migrations.run_migrations, _versions, _system_accounts)
+    assert versions == [1, 2]
+    assert accounts == ["infostudio"]
+
+
+def test_applied_migrations_are_skipped():
+    async def promote_mario(session):
+        await session.execute(text("UPDATE users SET is_system_account = 1 WHERE username = 'mario'"))
+        await session.commit()
+
+    # A second boot must not re-run the infostudio fix
+    *_, versions, accounts = _run(
+        migrations.run_migrations, promote_mario, migrations.run_migrations,
+        _versions, _system_accounts
+    )
+    assert versions == [1, 2]
+    assert accounts == ["infostudio", "mario"]
+
+
+MIGRATIONS = ["migrate_add_user_permission_columns", "migrate_fix_infostudio_system_account"]
+
+
+@pytest.mark.parametrize("failing, recorded, ran", [
+    (MIGRATIONS[0], [], MIGRATIONS[:1]),
+    (MIGRATIONS[1], [1], MIGRATIONS),
+])
+def test_failed_migration_stops_and_is_retried(monkeypatch, failing, recorded, ran):
+    originals = {name: getattr(migrations, name) for name in MIGRATIONS}
+    calls = []
+
+    def spy(name):
+        async def migration(session):
+            calls.append(name)
+            if name == failing:
+                raise RuntimeError("disk I/O error")
+            await originals[name](session)
+        return migration
+
+    for name in MIGRATIONS:
+        monkeypatch.setattr(migrations, name, spy(name))
+
+    async def calls_so_far(session):
+        return list(calls)
+
+    async def repair(session):
+        for name, migration in originals.items():
+            monkeypatch.setattr(migrations, name, migration)
+
+    _, versions_after_failure, seen, _, _, versions = _run(
+        migrations.run_migrations, _versions, calls_so_far,
+        repair, migrations.run_migrations, _versions
+    )
+    # Nothing after the failure ran or was recorded; the next boot retries it
+    assert versions_after_failure == recorded
+    assert seen == ran
+    assert versions == [1, 2]
@@ -0,0 +1,39 @@
+"""
+Pivot API: request bodies decoded with pydantic-core.
+"""
+import asyncio
+
+import pytest
+from fastapi.exceptions import RequestValidationError
+
+from app.api import pivot
+
+
+class RawRequest:
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def body(self) -> bytes:
+        return self._body
+
+
+def test_lazy_body_keeps_embedded_shape():
+    raw = (
+        b'{"request": {"group_by": ["Agente", "Cliente"], "metrics": [{"name": "Venduto", "field": "Venduto"}]},'
+        b' "parent_filters": {"Agente": "Rossi"}}'
+    )
+    body = asyncio.run(pivot.lazy_pivot_body(RawRequest(raw)))
+    assert body.request.group_by == ["Agente", "Cliente"]
+    assert body.request.metrics[0].aggregation == "SUM"
+    assert body.parent_filters == {"Agente": "Rossi"}
+
+
+def test_lazy_body_parent_filters_default_empty():
+    body = asyncio.run(pivot.lazy_pivot_body(RawRequest(b'{"request": {"group_by": ["Agente"]}}')))
+    assert body.parent_filters == {}
+
+
+@pytest.mark.parametrize("raw", [b'{"group_by": ["Agente"]}', b'{"request": {"limit": "x"}}', b"not json"])
+def test_invalid_lazy_body_is_a_validation_error(raw):
+    with pytest.raises(RequestValidationError):
+        asyncio.run(pivot.lazy_pivot_body(RawRequest(raw)))
@@ -0,0 +1,253 @@
+"""
+QueryEngine tests against an in-memory SQLite engine standing in for the
+pooled source-database engines (get_engine is stubbed).
+"""
+import asyncio
+from decimal import Decimal
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pytest
+
+from app.api.pivot import MetricConfig
+from app.models.schemas import GridRequest, PivotDrillRequest
+from app.services import query_engine
+from app.services.query_engine import QueryEngine
+
+CONFIG = {"host": "stub", "port": None, "database": "stub"}
+
+
+def _read_stream(query: str):
+    async def run():
+        chunks, row_count, _ = await QueryEngine.execute_query_stream("sqlite", CONFIG, query)
+        return row_count, b"".join([chunk async for chunk in chunks])
+
+    row_count, data = asyncio.run(run())
+    return row_count, ipc.open_stream(data).read_all()
+
+
+def test_execute_query_stream_end_to_end(engine, small_batches):
+    row_count, table = _read_stream("SELECT id, agent, amount FROM sales ORDER BY id")
+
+    assert row_count == -1
+    assert table.num_rows == 10
+    assert table.column("id").to_pylist() == list(range(10))
+    assert table.column("amount").to_pylist() == [i * 1.5 for i in range(10)]
+    # All NULL in the first batch, text afterwards: sent as a string column
+    assert table.schema.field("agent").type == pa.string()
+    assert table.column("agent").to_pylist() == [None] * 4 + [f"Agent{i % 3}" for i in range(4, 10)]
+
+
+def test_execute_query_stream_client_disconnect(engine, small_batches):
+    async def run():
+        chunks, _, _ = await QueryEngine.execute_query_stream("sqlite", CONFIG, "SELECT * FROM sales")
+        first = await chunks.__anext__()
+        # Client gone after the first chunk: the stream must shut down cleanly
+        await asyncio.wait_for(chunks.aclose(), timeout=5)
+        return first
+
+    assert asyncio.run(run())
+
+
+def test_conform_batch_casts_later_batches_to_the_stream_schema():
+    schema = query_engine._stream_schema({"qty": [1, 2], "note": [None, None]})
+
+    batch = query_engine._conform_batch({"qty": [Decimal("3"), None], "note": ["a", 7]}, schema)
+
+    assert batch.schema == schema
+    assert batch.column(0).to_pylist() == [3, None]
+    assert batch.column(1).to_pylist() == ["a", "7"]
+
+
+def test_conform_batch_rejects_lossy_type_changes():
+    schema = query_engine._stream_schema({"qty": [1, 2]})
+
+    with pytest.raises(ValueError, match="qty"):
+        query_engine._conform_batch({"qty": [Decimal("1.5")]}, schema)
+
+
+@pytest.mark.parametrize("filters", [
+    {"agent": {"type": "contains", "value": "AGENT1"}},
+    {"agent": {"type": "notContains", "value": "agent2"}},
+    {"agent": {"type": "startsWith", "value": "aGeNt"}},
+    {"agent": {"type": "endsWith", "value": "T0"}},
+    {"agent": {"type": "equals", "value": "Agent1"}},
+    {"agent": {"type": "notEqual", "value": "agent1"}},
+    {"amount": {"type": "greaterThan", "value": 6}, "agent": {"type": "isNotNull"}},
+])
+def test_cached_filter_matches_sql_filter(engine, filters):
+    # SQLite: case-insensitive LIKE, case-sensitive =
+    dialect = query_engine.get_dialect("sqlite")
+    where_sql, params = query_engine._build_safe_filter_clause(filters, dialect)
+    sql_ids = QueryEngine._execute_arrow_with_params_sync(
+        "sqlite", CONFIG, f"SELECT id FROM sales {where_sql} ORDER BY id", params
+    ).column("id").to_pylist()
+
+    raw = pl.from_arrow(
+        QueryEngine._execute_arrow_with_params_sync("sqlite", CONFIG, "SELECT * FROM sales", {})
+    )
+    cached_ids = raw.filter(query_engine._build_polars_filter(filters, dialect)).sort("id")["id"].to_list()
+
+    assert sql_ids
+    assert cached_ids == sql_ids
+
+
+@pytest.mark.parametrize("db_type, filters, expected", [
+    # PostgreSQL: LIKE and = are case-sensitive
+    ("postgresql", {"name": {"type": "contains", "value": "rossi"}}, [1]),
+    ("postgresql", {"name": {"type": "startsWith", "value": "ROSSI"}}, [2]),
+    ("postgresql", {"name": {"type": "equals", "value": "Rossi"}}, [0]),
+    # MSSQL/MySQL default collations: both case-insensitive
+    ("mssql", {"name": {"type": "contains", "value": "rossi"}}, [0, 1, 2]),
+    ("mysql", {"name": {"type": "equals", "value": "rossi"}}, [0, 1, 2]),
+    ("mssql", {"name": {"type": "notEqual", "value": "ROSSI"}}, [3]),
+])
+def test_cached_filter_follows_dialect_case_rules(db_type, filters, expected):
+    df = pl.DataFrame({"id": [0, 1, 2, 3], "name": ["Rossi", "rossi", "ROSSI", "Bianchi"]})
+    predicate = query_engine._build_polars_filter(filters, query_engine.get_dialect(db_type))
+    assert df.filter(predicate)["id"].to_list() == expected
+
+
+@pytest.mark.parametrize("db_type, expected", [("mssql", None), ("postgresql", 3)])
+def test_cached_pivot_leaves_case_variants_to_case_insensitive_sources(db_type, expected):
+    # MSSQL groups 'Rossi' and 'ROSSI' together: not reproducible in Polars
+    raw = pa.table({"name": ["Rossi", "rossi", "ROSSI"], "amount": [1.0, 2.0, 3.0]})
+    metrics = [{"field": "amount", "aggregation": "SUM", "name": "amount"}]
+    result = QueryEngine._aggregate_cached_sync(
+        db_type, query_engine._to_ipc_bytes(raw), ["name"], metrics
+    )
+    assert (result if result is None else result[1]) == expected
+
+
+def _ipc_to_polars(data) -> pl.DataFrame:
+    return pl.from_arrow(ipc.open_stream(pa.py_buffer(data)).read_all())
+
+
+@pytest.mark.parametrize("filter_model", [
+    {"agent": {"type": "contains", "filter": "AGENT"}},
+    {"agent": {"type": "endsWith", "filter": "t1"}},
+    {"agent": {"type": "notContains", "filter": "AgEnT2"}},
+])
+def test_cached_drill_matches_sql_drill(engine, filter_model):
+    request = PivotDrillRequest(
+        rowGroupCols=["agent"],
+        groupKeys=[],
+        valueCols=[{"colId": "amount", "aggFunc": "sum"}, {"colId": "id", "aggFunc": "count"}],
+        filterModel=filter_model,
+        startRow=0,
+        endRow=100,
+    )
+    base_query = "SELECT * FROM sales"
+
+    sql_bytes, sql_total, _ = asyncio.run(
+        QueryEngine.execute_pivot_drill("sqlite", CONFIG, base_query, request)
+    )
+    raw = QueryEngine._execute_arrow_with_params_sync("sqlite", CONFIG, base_query, {})
+    cached_bytes, cached_total, _ = QueryEngine._drill_cached_sync(
+        "sqlite", query_engine._to_ipc_bytes(raw), request
+    )
+
+    sql_df = _ipc_to_polars(sql_bytes)
+    cached_df = _ipc_to_polars(cached_bytes)
+    assert sql_df.height > 0
+    assert cached_total == sql_total
+    assert cached_df["key_val"].to_list() == sql_df["key_val"].to_list()
+    assert cached_df["amount"].to_list() == pytest.approx(sql_df["amount"].to_list())
+    assert cached_df["id"].to_list() == sql_df["id"].to_list()
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT id, agent, amount FROM sales",
+    "SELECT id, agent, amount FROM sales UNION ALL SELECT id, agent, amount FROM sales",
+])
+def test_stream_limit(engine, small_batches, query):
+    # Inlined cap on the simple query, fetch-side cap on the union
+    async def run():
+        chunks, _, _ = await QueryEngine.execute_query_stream("sqlite", CONFIG, query, limit=7)
+        return b"".join([bytes(c) async for c in chunks])
+
+    table = ipc.open_stream(asyncio.run(run())).read_all()
+    assert table.num_rows == 7
+
+
+@pytest.mark.parametrize("start_row", [0, 5])
+def test_grid_page(engine, start_row):
+    # First page is capped inline, later pages go through OFFSET
+    request = GridRequest(startRow=start_row, endRow=start_row + 5)
+    data, total, _ = asyncio.run(QueryEngine.execute_grid_query(
+        "sqlite", CONFIG, "SELECT id, agent, amount FROM sales", request
+    ))
+    table = ipc.open_stream(data).read_all()
+    assert total == 10
+    assert table.column("id").to_pylist() == list(range(start_row, start_row + 5))
+
+
+@pytest.mark.parametrize("db_type, group, flag", [
+    ("postgresql", 'GROUP BY ROLLUP("region", "agent")', 'GROUPING("agent") AS "__g_agent"'),
+    ("mssql", "GROUP BY ROLLUP([region], [agent])", "GROUPING([agent]) AS [__g_agent]"),
+    ("mysql", "GROUP BY `region`, `agent` WITH ROLLUP", "GROUPING(`agent`) AS `__g_agent`"),
+])
+def test_rollup_pivot_sql_per_dialect(db_type, group, flag):
+    metrics = (tuple({"field": "amount", "aggregation": "SUM", "name": "amount"}.items()),)
+    prefix, suffix = query_engine._build_pivot_sql(
+        query_engine.get_dialect(db_type), ("region", "agent"), metrics, "", False, True
+    )
+    assert flag in prefix
+    assert group in suffix
+
+    plain_prefix, plain_suffix = query_engine._build_pivot_sql(
+        query_engine.get_dialect(db_type), ("region", "agent"), metrics, "", False
+    )
+    assert "GROUPING" not in plain_prefix
+    assert "ROLLUP" not in plain_suffix
+
+
+def test_rollup_pivot_subtotals():
+    # ROLLUP/GROUPING() executed for real (DuckDB speaks the PostgreSQL form)
+    duckdb = pytest.importorskip("duckdb")
+    metrics = (tuple({"field": "amount", "aggregation": "SUM", "name": "amount"}.items()),)
+    prefix, suffix = query_engine._build_pivot_sql(
+        query_engine.get_dialect("postgresql"), ("region", "agent"), metrics, "", False, True
+    )
+    base_query = (
+        "SELECT * FROM (VALUES ('N', 'A', 1.0), ('N', NULL, 2.0), ('S', 'B', 4.0))"
+        " AS t(region, agent, amount)"
+    )
+    rows = duckdb.sql(prefix + base_query + suffix).fetchall()
+
+    by_key = {(r[0], r[1], r[3], r[4]): r[2] for r in rows}
+    # Leaf rows, including the real NULL agent (flag 0)
+    assert by_key[("N", "A", 0, 0)] == 1.0
+    assert by_key[("N", None, 0, 0)] == 2.0
+    # Region subtotals (agent rolled up) and the grand total
+    assert by_key[("N", None, 0, 1)] == 3.0
+    assert by_key[("S", None, 0, 1)] == 4.0
+    assert by_key[(None, None, 1, 1)] == 7.0
+    assert len(rows) == 6
+
+
+def _margin_metric(**fields) -> dict:
+    # As the pivot endpoint passes it: model_dump() keeps unset fields as None
+    return MetricConfig(name="Margine", type="margin", **fields).model_dump()
+
+
+@pytest.mark.parametrize("fields, rev, cost", [
+    ({"field": "Ricavo"}, "Ricavo", "Costo"),
+    ({}, "Venduto", "Costo"),
+    ({"revenueField": "Ricavo", "costField": "Spesa"}, "Ricavo", "Spesa"),
+])
+def test_margin_metric_defaults_unset_fields(fields, rev, cost):
+    metric = _margin_metric(**fields)
+    prefix, _ = query_engine._build_pivot_sql(
+        query_engine.get_dialect("postgresql"), ("agent",), (tuple(metric.items()),), "", False
+    )
+    assert f'SUM("{rev}") - SUM("{cost}")' in prefix
+
+
+def test_cached_margin_metric_defaults_unset_fields():
+    raw = pa.table({"agent": ["A", "A"], "Venduto": [100.0, 100.0], "Costo": [50.0, 70.0]})
+    data, rows, _ = QueryEngine._aggregate_cached_sync(
+        "postgresql", query_engine._to_ipc_bytes(raw), ["agent"], [_margin_metric()]
+    )
+    assert _ipc_to_polars(data)["Margine"].to_list() == [40.0]
@@ -0,0 +1,215 @@
+"""
+Reports API: /data stream caching and the pivot-drill endpoint, called
+directly with a stub session over the SQLite fixture engine.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import reports
+from app.models.schemas import PivotDrillRequest
+from app.services.query_engine import QueryEngine
+
+CONFIG = {"host": "stub", "port": None, "database": "stub"}
+
+REPORT = SimpleNamespace(id=1, connection_id=1, query="SELECT * FROM sales", cache_enabled=False)
+CONNECTION = SimpleNamespace(
+    id=1, db_type="sqlite", host="stub", port=None, database="stub",
+    username="stub", password_encrypted="stub", ssl_enabled=False
+)
+
+
+class _Result:
+    def __init__(self, obj):
+        self.obj = obj
+
+    def scalar_one_or_none(self):
+        return self.obj
+
+
+class StubSession:
+    """Answers the endpoint's Report and Connection lookups, in that order"""
+
+    def __init__(self):
+        self.results = [REPORT, CONNECTION]
+
+    async def execute(self, statement):
+        return _Result(self.results.pop(0))
+
+
+@pytest.fixture
+def drill_endpoint(engine, monkeypatch):
+    monkeypatch.setattr(reports, "decrypt_password", lambda value: value)
+
+    async def call(request: PivotDrillRequest):
+        return await reports.execute_pivot_drill(1, request, db=StubSession(), user=None)
+
+    return call
+
+
+def _drill_request(**overrides) -> PivotDrillRequest:
+    fields = dict(
+        rowGroupCols=["agent"], groupKeys=[], startRow=0, endRow=100,
+        valueCols=[{"colId": "amount", "aggFunc": "sum"}],
+    )
+    return PivotDrillRequest(**{**fields, **overrides})
+
+
+@pytest.mark.parametrize("row_limit, cached", [(20, True), (10, False), (4, False)])
+def test_stream_and_cache_skips_capped_stream(engine, small_batches, monkeypatch, row_limit, cached):
+    # 10 source rows: a stream that reaches the cap may be cut and is never cached
+    stored = {}
+
+    async def set_query(report_id, query_hash, data):
+        stored[query_hash] = data
+
+    monkeypatch.setattr(reports.cache, "set_query", set_query)
+
+    async def run():
+        chunks, _, _ = await QueryEngine.execute_query_stream(
+            "sqlite", CONFIG, "SELECT id, agent, amount FROM sales", limit=row_limit
+        )
+        return b"".join([c async for c in reports._stream_and_cache(chunks, 1, "h", row_limit)])
+
+    sent = asyncio.run(run())
+    assert ("h" in stored) is cached
+    if cached:
+        assert stored["h"] == sent
+
+
+@pytest.mark.parametrize("overrides", [
+    {"valueCols": [{"colId": "amount", "aggFunc": "median"}]},
+    {"havingModel": [{"field": "amount", "aggregation": "median", "value": 1}]},
+    {"havingModel": [{"field": "amount", "type": "between", "value": 1}]},
+])
+def test_drill_rejects_invalid_request_with_400(drill_endpoint, overrides):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(drill_endpoint(_drill_request(**overrides)))
+    assert exc.value.status_code == 400
+
+
+class StubDrill:
+    """Stands in for QueryEngine.execute_pivot_drill, held until released"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self, db_type, config, base_query, request):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return b"ipc", 3, 1.0
+
+
+@pytest.fixture
+def stub_drill(drill_endpoint, monkeypatch):
+    def install(error: Exception = None) -> StubDrill:
+        stub = StubDrill(error)
+        monkeypatch.setattr(reports.query_engine, "execute_pivot_drill", stub)
+        return stub
+
+    return install
+
+
+async def _settle():
+    # Let the shared task's done callback run
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_identical_drills_share_one_execution(drill_endpoint, stub_drill):
+    stub = stub_drill()
+
+    async def run():
+        waiters = [asyncio.ensure_future(drill_endpoint(_drill_request())) for _ in range(3)]
+        await _settle()
+        assert len(reports._inflight_drills) == 1
+        stub.release.set()
+        responses = await asyncio.gather(*waiters)
+        await _settle()
+        return responses
+
+    responses = asyncio.run(run())
+    assert stub.calls == 1
+    assert [r.headers["x-total-count"] for r in responses] == ["3"] * 3
+    assert reports._inflight_drills == {}
+
+
+def test_different_drills_run_separately(drill_endpoint, stub_drill):
+    stub = stub_drill()
+    stub.release.set()
+
+    async def run():
+        await asyncio.gather(
+            drill_endpoint(_drill_request()),
+            drill_endpoint(_drill_request(groupKeys=["Agent1"], rowGroupCols=["agent", "id"])),
+        )
+
+    asyncio.run(run())
+    assert stub.calls == 2
+
+
+def test_drill_error_reaches_every_waiter(drill_endpoint, stub_drill):
+    stub = stub_drill(RuntimeError("connection lost"))
+
+    async def run():
+        waiters = [asyncio.ensure_future(drill_endpoint(_drill_request())) for _ in range(2)]
+        await _settle()
+        stub.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        await _settle()
+        return results
+
+    results = asyncio.run(run())
+    assert stub.calls == 1
+    for result in results:
+        assert isinstance(result, HTTPException)
+        assert result.status_code == 500
+        assert result.detail == "connection lost"
+    assert reports._inflight_drills == {}
+
+
+def test_cancelled_waiter_leaves_shared_drill_running(drill_endpoint, stub_drill):
+    stub = stub_drill()
+
+    async def run():
+        gone = asyncio.ensure_future(drill_endpoint(_drill_request()))
+        await _settle()
+        gone.cancel()
+        await _settle()
+        # The disconnected client must not cancel the query of the others
+        assert len(reports._inflight_drills) == 1
+        stayed = asyncio.ensure_future(drill_endpoint(_drill_request()))
+        await _settle()
+        stub.release.set()
+        response = await stayed
+        await _settle()
+        return gone, response
+
+    gone, response = asyncio.run(run())
+    assert gone.cancelled()
+    assert stub.calls == 1
+    assert response.headers["x-total-count"] == "3"
+    assert reports._inflight_drills == {}
+
+
+def test_cancelled_shared_drill_is_removed(drill_endpoint, stub_drill):
+    stub_drill()
+
+    async def run():
+        waiter = asyncio.ensure_future(drill_endpoint(_drill_request()))
+        await _settle()
+        (shared,) = reports._inflight_drills.values()
+        shared.cancel()
+        result = (await asyncio.gather(waiter, return_exceptions=True))[0]
+        await _settle()
+        return result
+
+    result = asyncio.run(run())
+    assert isinstance(result, asyncio.CancelledError)
+    assert reports._inflight_drills == {}
@@ -0,0 +1,55 @@
+"""
+reset_admin: the admin UPSERT on an in-memory aiosqlite database.
+"""
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app import reset_admin
+from app.core.security import verify_password
+from app.db.database import Base, User
+
+
+def _reset(monkeypatch, existing=None):
+    """Run reset_admin_password, optionally over an existing admin row"""
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        if existing:
+            async with sessions() as db:
+                db.add(User(**existing))
+                await db.commit()
+
+        monkeypatch.setattr(reset_admin, "AsyncSessionLocal", sessions)
+        await reset_admin.reset_admin_password()
+
+        async with sessions() as db:
+            users = (await db.execute(select(User))).scalars().all()
+        await engine.dispose()
+        return users
+
+    return asyncio.run(run())
+
+
+def test_creates_missing_admin(monkeypatch):
+    (admin,) = _reset(monkeypatch)
+    assert admin.username == "admin"
+    assert admin.role == "admin"
+    assert admin.is_active
+    assert verify_password("admin", admin.password_hash)
+
+
+def test_resets_existing_admin_in_place(monkeypatch):
+    (admin,) = _reset(monkeypatch, existing=dict(
+        id=7, username="admin", email="boss@example.com", full_name="Boss",
+        password_hash="old-hash", role="superuser", is_active=False
+    ))
+    # Only the password and the active flag change: same row, same profile
+    assert admin.id == 7
+    assert (admin.email, admin.full_name, admin.role) == ("boss@example.com", "Boss", "superuser")
+    assert admin.is_active
+    assert verify_password("admin", admin.password_hash)
@@ -2,6 +2,7 @@
  * API Service with automatic token handling
  */
 import axios, { AxiosError } from 'axios';
+import { tableFromIPC, DataType } from 'apache-arrow';
 
 const api = axios.create({
   baseURL: '/api',
@@ -31,6 +32,48 @@ api.interceptors.response.use(
   }
 );
 
+/**
+ * Decode an Arrow IPC payload into plain row objects, with the same value
+ * types the former JSON responses had (int64 -> number, dates -> ISO strings)
+ */
+// Decimal cells arrive as the unscaled two's-complement integer (32-bit
+// little-endian words): rebuild it and apply the column scale
+const decimalToNumber = (words: ArrayLike<number>, scale: number): number => {
+  let unscaled = 0n;
+  for (let k = words.length - 1; k >= 0; k--) {
+    unscaled = (unscaled << 32n) | BigInt(words[k] >>> 0);
+  }
+  if (words[words.length - 1] & 0x80000000) {
+    unscaled -= 1n << BigInt(32 * words.length);
+  }
+  return Number(unscaled) / 10 ** scale;
+};
+
+const arrowToRows = (buffer: ArrayBuffer): Record<string, any>[] => {
+  const table = tableFromIPC(new Uint8Array(buffer));
+  const fields = table.schema.fields;
+  const columns = fields.map((field) => table.getChild(field.name));
+  const rows: Record<string, any>[] = new Array(table.numRows);
+  for (let i = 0; i < table.numRows; i++) {
+    const row: Record<string, any> = {};
+    for (let j = 0; j < fields.length; j++) {
+      let value = columns[j]?.get(i);
+      if (typeof value === 'bigint') {
+        value = Number(value);
+      } else if (value != null && DataType.isDecimal(fields[j].type)) {
+        value = decimalToNumber(value, fields[j].type.scale);
+      } else if (value != null && DataType.isDate(fields[j].type)) {
+        value = new Date(value).toISOString().slice(0, 10);
+      } else if (value != null && DataType.isTimestamp(fields[j].type)) {
+        value = new Date(value).toISOString().slice(0, 19);
+      }
+      row[fields[j].name] = value;
+    }
+    rows[i] = row;
+  }
+  return rows;
+};
+
 // Auth
 export const authApi = {
   login: async (username: string, password: string) => {
@@ -101,12 +144,24 @@ export const reportsApi = {
     return data;
   },
   executeGrid: async (id: number, request: any) => {
-    const { data } = await api.post(`/reports/${id}/grid`, request);
-    return data;
+    const response = await api.post(`/reports/${id}/grid`, request, {
+      responseType: 'arraybuffer'
+    });
+    return {
+      rows: arrowToRows(response.data),
+      lastRow: parseInt(response.headers['x-total-count'] || '0'),
+      elapsed_ms: parseFloat(response.headers['x-query-time'] || '0')
+    };
   },
   executePivotDrill: async (id: number, request: any) => {
-    const { data } = await api.post(`/reports/${id}/pivot-drill`, request);
-    return data;
+    const response = await api.post(`/reports/${id}/pivot-drill`, request, {
+      responseType: 'arraybuffer'
+    });
+    return {
+      rows: arrowToRows(response.data),
+      count: parseInt(response.headers['x-total-count'] || '0'),
+      elapsed_ms: parseFloat(response.headers['x-query-time'] || '0')
+    };
   }
 };
 